@@ -0,0 +1,141 @@
+"""
+Offline ingestion from the SEC nightly ``companyfacts.zip`` bulk archive.
+
+The archive (https://www.sec.gov/Archives/edgar/daily-index/xbrl/companyfacts.zip)
+holds one ``CIK##########.json`` companyfacts document per filer. Members
+are read straight out of a local copy, never extracted to disk, and parsed
+in a process pool with the same tag/unit logic as
+``get_company_fundamentals``. No HTTP requests, so no rate limit applies.
+
+Each company's rows are deduplicated on their own (the primary key starts
+with Ticker, so this matches deduplicating the whole dataset) and appended
+to the long CSV as soon as they are ready, keeping memory bounded for the
+full market.
+
+Usage:
+    python bulkIngest.py companyfacts.zip          # companies in COMPANIES
+    python bulkIngest.py companyfacts.zip --all    # every filer in the archive
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import sys
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Mapping
+
+import pandas as pd
+
+from companyFacts import extract_us_gaap
+from fetchAllData import COMPANIES, GAAP_TAGS, build_company_frame, deduplicate_by_primary_key
+from longSchema import write_csv
+from tickerResolver import TICKER_INDEX, normalize_companies
+
+BULK_ZIP_PATH = os.getenv("SEC_API_BULK_ZIP", "companyfacts.zip")
+BULK_WORKERS = int(os.getenv("SEC_API_BULK_WORKERS", str(os.cpu_count() or 1)))
+
+_MEMBER_NAME = re.compile(r"CIK(\d{10})\.json$")
+
+# Opened once per worker process by _open_archive
+_archive: zipfile.ZipFile | None = None
+
+
+def _open_archive(path: str) -> None:
+    global _archive
+    _archive = zipfile.ZipFile(path)
+
+
+def list_members(path: str, companies: Mapping[str, str] | Iterable[str] | None = COMPANIES) -> list[tuple[str, str, str]]:
+    """
+    Return ``(member, cik, ticker)`` for the archive members to ingest.
+
+    With ``companies=None`` every filer is included, named by its SEC ticker;
+    filers without one use their zero-padded CIK in the Ticker column.
+    """
+    tickers = None
+    if companies is not None:
+        tickers = {cik: ticker for ticker, cik in normalize_companies(companies).items()}
+
+    members = []
+    with zipfile.ZipFile(path) as archive:
+        for name in archive.namelist():
+            match = _MEMBER_NAME.search(name)
+            if not match:
+                continue
+            cik = match.group(1)
+            if tickers is None:
+                members.append((name, cik, TICKER_INDEX.ticker_for(cik) or cik))
+            elif cik in tickers:
+                members.append((name, cik, tickers[cik]))
+    return members
+
+
+def parse_member(name: str, cik: str, ticker: str) -> pd.DataFrame:
+    """Decode one archive member into deduplicated long-format rows (worker side)."""
+    facts = extract_us_gaap(_archive.read(name), GAAP_TAGS)
+    return deduplicate_by_primary_key(build_company_frame(facts, cik, ticker))
+
+
+def ingest_companyfacts_zip(
+    path: str = BULK_ZIP_PATH,
+    output_path: str = "fundamentals_long.csv",
+    companies: Mapping[str, str] | Iterable[str] | None = COMPANIES,
+    workers: int = BULK_WORKERS,
+) -> int:
+    """
+    Write the long dataset for ``companies`` from a local companyfacts.zip.
+
+    Members are written in archive order; at most ``2 * workers`` parsed
+    companies are held in memory at once. Returns the number of rows written.
+    """
+    members = list_members(path, companies)
+    workers = max(1, workers)
+    print(f"Ingesting {len(members)} companies from {path} with {workers} workers")
+
+    total_rows = 0
+    header = True
+    pending: deque = deque()
+    next_member = iter(members)
+
+    with open(output_path, "w", newline="", encoding="utf-8") as out, ProcessPoolExecutor(
+        max_workers=workers, initializer=_open_archive, initargs=(path,)
+    ) as pool:
+        while True:
+            while len(pending) < 2 * workers:
+                member = next(next_member, None)
+                if member is None:
+                    break
+                pending.append((member, pool.submit(parse_member, *member)))
+            if not pending:
+                break
+
+            (name, cik, ticker), future = pending.popleft()
+            try:
+                df = future.result()
+            except Exception as err:
+                print(f"[WARN] Could not parse {name}: {err}")
+                continue
+            if df.empty:
+                continue
+            write_csv(df, out, header=header)
+            header = False
+            total_rows += len(df)
+            if companies is not None:
+                print(f"  → {ticker}: found {len(df)} rows")
+
+    print(f"\n✓ Saved long-format dataset -> {output_path} ({total_rows} rows)")
+    return total_rows
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    path = args[0] if args else BULK_ZIP_PATH
+    companies = None if "--all" in sys.argv[1:] else COMPANIES
+    ingest_companyfacts_zip(path, companies=companies)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Resumable fetch runs.
+
+A ``RunCheckpoint`` lives in its own directory under ``.sec_cache/runs/``,
+named after a hash of the script and the universe being fetched:
+
+* ``manifest.json`` - run id and start time.
+* ``progress.jsonl`` - one line appended per finished company
+  (``done`` with its row count, or ``failed`` with the attempt count).
+* ``companies/CIK##########.pkl.gz`` - that company's rows as a pickled
+  DataFrame, so the column dtypes survive a resume.
+
+When a run dies part-way, the next run over the same universe finds the
+directory, skips every company already ``done`` and only fetches the rest
+(failed ones included). The directory is deleted once the outputs have been
+saved. Checkpoints older than ``SEC_API_CHECKPOINT_MAX_AGE_HOURS`` are
+discarded instead of resumed, so a stale run never leaks old data.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Mapping
+
+import pandas as pd
+
+from responseCache import CACHE_DIR, atomic_write
+
+CHECKPOINT_ENABLED = os.getenv("SEC_API_CHECKPOINT", "true").lower() not in {"0", "false", "no"}
+CHECKPOINT_DIR = Path(os.getenv("SEC_API_CHECKPOINT_DIR", str(CACHE_DIR / "runs")))
+CHECKPOINT_MAX_AGE_HOURS = float(os.getenv("SEC_API_CHECKPOINT_MAX_AGE_HOURS", "24"))
+
+DONE = "done"
+FAILED = "failed"
+
+
+def run_id_for(script: str, companies: Mapping[str, str], tags: Iterable[str] = ()) -> str:
+    """
+    Stable id for one script run over one universe (and tag list).
+
+    Only the script's file name is hashed, so the id is the same however the
+    script was invoked (relative or absolute path, any working directory).
+    """
+    digest = hashlib.sha1()
+    digest.update(Path(script).name.encode("utf-8"))
+    for ticker, cik in sorted(companies.items()):
+        digest.update(f"\0{ticker}={cik}".encode("utf-8"))
+    for tag in tags:
+        digest.update(f"\1{tag}".encode("utf-8"))
+    return f"{Path(script).stem}-{digest.hexdigest()[:12]}"
+
+
+class RunCheckpoint:
+    """Per-company row artifacts plus a progress journal for one run."""
+
+    def __init__(self, run_id: str, directory: Path = CHECKPOINT_DIR, max_age_hours: float = CHECKPOINT_MAX_AGE_HOURS) -> None:
+        self.run_id = run_id
+        self.directory = Path(directory) / run_id
+        self.max_age_seconds = max_age_hours * 3600
+        self._lock = threading.Lock()
+        self._status: Dict[str, dict] = {}
+        self._open()
+
+    @classmethod
+    def for_run(cls, script: str, companies: Mapping[str, str], tags: Iterable[str] = ()) -> "RunCheckpoint":
+        return cls(run_id_for(script, companies, tags))
+
+    @property
+    def _manifest_path(self) -> Path:
+        return self.directory / "manifest.json"
+
+    @property
+    def _progress_path(self) -> Path:
+        return self.directory / "progress.jsonl"
+
+    def _artifact_path(self, cik: str) -> Path:
+        return self.directory / "companies" / f"CIK{cik.zfill(10)}.pkl.gz"
+
+    def _open(self) -> None:
+        try:
+            manifest = json.loads(self._manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            manifest = None
+
+        if manifest is not None and time.time() - manifest.get("created_ts", 0) > self.max_age_seconds:
+            print(f"[WARN] Discarding checkpoint {self.run_id} older than {self.max_age_seconds / 3600:.0f}h")
+            self.clear()
+            manifest = None
+
+        if manifest is None:
+            manifest = {
+                "run_id": self.run_id,
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "created_ts": time.time(),
+            }
+            atomic_write(self._manifest_path, json.dumps(manifest, indent=2).encode("utf-8"))
+            return
+
+        try:
+            lines = self._progress_path.read_text(encoding="utf-8").splitlines()
+        except OSError:
+            lines = []
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn last line from a crash
+            self._status[entry["cik"]] = entry
+
+    def status(self, cik: str) -> dict | None:
+        return self._status.get(cik.zfill(10))
+
+    def pending(self, companies: Mapping[str, str], settled: Iterable[str] = ()) -> dict[str, str]:
+        """
+        Companies that still need fetching (never attempted or failed).
+
+        Companies this run already failed on count as done when their CIK
+        is in ``settled`` (e.g. permanent failures from the dead-letter
+        queue): refetching them can't succeed.
+        """
+        settled = {cik.zfill(10) for cik in settled}
+        pending = {}
+        for ticker, cik in companies.items():
+            state = (self.status(cik) or {}).get("state")
+            if state != DONE and not (state == FAILED and cik.zfill(10) in settled):
+                pending[ticker] = cik
+        return pending
+
+    def record(self, cik: str, ticker: str, rows: pd.DataFrame | None) -> None:
+        """Save one company's rows, or mark it failed when ``rows`` is None."""
+        cik = cik.zfill(10)
+        if rows is not None:
+            payload = pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL)
+            atomic_write(self._artifact_path(cik), gzip.compress(payload, compresslevel=1))
+
+        with self._lock:
+            previous = self._status.get(cik, {})
+            entry = {
+                "cik": cik,
+                "ticker": ticker,
+                "state": DONE if rows is not None else FAILED,
+                "rows": len(rows) if rows is not None else 0,
+                "attempts": previous.get("attempts", 0) + 1,
+                "updated": datetime.now().isoformat(timespec="seconds"),
+            }
+            self._status[cik] = entry
+            self._progress_path.parent.mkdir(parents=True, exist_ok=True)
+            with self._progress_path.open("a", encoding="utf-8") as handle:
+                handle.write(json.dumps(entry) + "\n")
+
+    def load_frame(self, cik: str) -> pd.DataFrame:
+        """Rows saved for ``cik`` (empty if none were saved)."""
+        try:
+            return pickle.loads(gzip.decompress(self._artifact_path(cik).read_bytes()))
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return pd.DataFrame()
+
+    def summary(self) -> str:
+        states = [entry["state"] for entry in self._status.values()]
+        return f"{states.count(DONE)} done, {states.count(FAILED)} failed"
+
+    def clear(self) -> None:
+        """Delete the checkpoint once its run has been saved."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self._status = {}
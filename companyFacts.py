@@ -0,0 +1,161 @@
+"""
+Download helpers for the SEC companyfacts endpoint.
+
+``fetch_company_facts`` returns only the us-gaap facts for the requested
+tags, using the conditional-GET cache in responseCache.py so unchanged
+companies cost a single 304 round-trip. Payloads are decoded with
+``extract_us_gaap``, which skips everything outside those tags instead of
+materializing the whole document.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+from responseCache import VALIDATOR_CACHE
+from secHttp import fetch_or_raise
+
+COMPANYFACTS_URL = "https://data.sec.gov/api/xbrl/companyfacts/CIK{cik}.json"
+
+_OBJECT_KEY_END = re.compile(rb'":\{')
+
+
+def companyfacts_url(cik: str) -> str:
+    return COMPANYFACTS_URL.format(cik=cik.zfill(10))
+
+
+def select_us_gaap(data: dict[str, Any], tags: Iterable[str]) -> dict[str, Any]:
+    """Return the us-gaap facts in ``data`` restricted to ``tags``."""
+    us_gaap = data.get("facts", {}).get("us-gaap", {})
+    return {tag: us_gaap[tag] for tag in dict.fromkeys(tags) if tag in us_gaap}
+
+
+def _object_keys(content: bytes) -> list[tuple[bytes, int]]:
+    """
+    Return ``(key, offset)`` for every key whose value is a JSON object.
+
+    ``offset`` points at the value's opening brace. A ``"`` that is not
+    escaped can only end a string, and a string followed by ``:{`` can only
+    be an object key, so a byte search is enough; no tokenizing needed.
+    """
+    keys = []
+    for match in _OBJECT_KEY_END.finditer(content):
+        quote = match.start()
+        backslashes = 0
+        while content[quote - 1 - backslashes] == 0x5C:  # "\"
+            backslashes += 1
+        if backslashes % 2:
+            continue  # escaped quote inside a string value
+        start = content.rfind(b'"', 0, quote)
+        keys.append((content[start + 1:quote], match.end() - 1))
+    return keys
+
+
+def extract_us_gaap(content: bytes, tags: Iterable[str]) -> dict[str, Any]:
+    """
+    Decode only the us-gaap facts for ``tags`` from a raw companyfacts payload.
+
+    Locates each wanted tag with a byte scan and decodes just that tag's
+    object, so the hundreds of other us-gaap/dei/ifrs tags are never turned
+    into Python objects. Equivalent to ``select_us_gaap(json.loads(content))``,
+    which is used as a fallback for any payload that doesn't have the
+    expected companyfacts layout.
+    """
+    wanted = {tag.encode("utf-8"): tag for tag in tags}
+    if any(not name[:1].isupper() for name in wanted):
+        return select_us_gaap(json.loads(content), tags)
+
+    keys = _object_keys(content)
+    if not keys or keys[0][0] != b"facts":
+        return select_us_gaap(json.loads(content), tags)
+
+    # Layout: facts -> taxonomy (dei, us-gaap, ...) -> Tag -> units.
+    # Taxonomy prefixes are lower-case; tag names are UpperCamelCase.
+    found: dict[str, tuple[int, int]] = {}
+    taxonomy = None
+    for i, (key, offset) in enumerate(keys[1:], start=1):
+        if key == b"units":
+            continue
+        if key[:1].islower():
+            taxonomy = key
+            continue
+        if taxonomy != b"us-gaap" or key not in wanted:
+            continue
+        end = len(content)
+        for next_key, next_offset in keys[i + 1:]:
+            if next_key != b"units":
+                end = content.rfind(b'"', 0, next_offset - 2)
+                break
+        found[wanted[key]] = (offset, end)
+
+    decoder = json.JSONDecoder()
+    facts = {}
+    try:
+        for tag in dict.fromkeys(tags):
+            if tag in found:
+                start, end = found[tag]
+                facts[tag], _ = decoder.raw_decode(content[start:end].decode("utf-8"))
+    except ValueError:
+        return select_us_gaap(json.loads(content), tags)
+    return facts
+
+
+@dataclass
+class CompanyFactsDownload:
+    """
+    Result of the network half of a companyfacts fetch.
+
+    Either ``content`` holds a raw payload still to be parsed, or ``facts``
+    holds facts reused from the validator cache after a 304. The object is
+    picklable so it can be handed to a parser process.
+    """
+
+    cik: str
+    content: bytes | None = None
+    facts: dict[str, Any] | None = None
+    validators: dict[str, str] = field(default_factory=dict)
+
+
+def download_company_facts(cik: str, tags: Iterable[str]) -> CompanyFactsDownload:
+    """
+    Download one company's companyfacts payload without parsing it.
+
+    Raises ``secHttp.SecFetchError`` if the request failed after retries.
+    """
+    tags = list(dict.fromkeys(tags))
+    cached = VALIDATOR_CACHE.load(cik, tags)
+    headers = cached.conditional_headers() if cached else None
+
+    response = fetch_or_raise(companyfacts_url(cik), headers=headers)
+    if response.status_code == 304 and cached is not None:
+        facts = {tag: cached.facts[tag] for tag in tags if tag in cached.facts}
+        return CompanyFactsDownload(cik=cik, facts=facts)
+
+    validators = {
+        name: response.headers[name]
+        for name in ("ETag", "Last-Modified")
+        if name in response.headers
+    }
+    return CompanyFactsDownload(cik=cik, content=response.content, validators=validators)
+
+
+def parse_company_facts(download: CompanyFactsDownload, tags: Iterable[str]) -> dict[str, Any]:
+    """Turn a download into us-gaap facts and remember its validators."""
+    if download.facts is not None:
+        return download.facts
+    tags = list(dict.fromkeys(tags))
+    facts = extract_us_gaap(download.content or b"{}", tags)
+    VALIDATOR_CACHE.store(download.cik, download.validators, tags, facts)
+    return facts
+
+
+def fetch_company_facts(cik: str, tags: Iterable[str]) -> dict[str, Any]:
+    """
+    Fetch us-gaap facts for ``tags`` for one company.
+
+    Raises ``secHttp.SecFetchError`` if the request failed after retries.
+    """
+    return parse_company_facts(download_company_facts(cik, tags), tags)
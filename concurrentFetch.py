@@ -0,0 +1,251 @@
+"""
+Concurrent companyfacts fetching.
+
+Runs a per-company fetch function (e.g. ``get_company_fundamentals``) for a
+whole ``COMPANIES`` universe on an asyncio event loop. The blocking
+``requests`` calls run on a bounded thread pool, and the SEC request ceiling
+is enforced by ``rateLimit.SEC_RATE_LIMITER`` inside ``fetch_with_retry``.
+
+Results come back in the same order as the input dict, so the combined
+dataset is identical to the serial path.
+
+``fetch_parse_pipeline`` splits the work further: download threads push raw
+payloads into a bounded queue and a ``ProcessPoolExecutor`` turns them into
+row batches, so JSON decoding and row building use every core while the
+network wait continues. The queue and the cap on in-flight parse jobs give
+backpressure, so buffered payloads stay bounded for any universe size.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Mapping
+
+# Enable with SEC_API_ASYNC_FETCH=true (serial fetching remains the default)
+ASYNC_FETCH = os.getenv("SEC_API_ASYNC_FETCH", "false").lower() not in {"0", "false", "no"}
+MAX_CONCURRENCY = int(os.getenv("SEC_API_MAX_CONCURRENCY", "8"))
+# Parser processes for the download/parse pipeline (0 keeps parsing in the fetch threads)
+PARSE_WORKERS = int(os.getenv("SEC_API_PARSE_WORKERS", "0"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("SEC_API_PIPELINE_QUEUE_SIZE", "16"))
+
+# How long the pipeline waits on its queue before checking parse results again
+_POLL_SECONDS = 0.05
+
+CompanyFetcher = Callable[[str, str], List[Dict]]
+PayloadDownloader = Callable[[str, str], Any]
+PayloadParser = Callable[[Any, str, str], List[Dict]]
+
+
+async def fetch_companies_async(
+    companies: Mapping[str, str],
+    fetch_company: CompanyFetcher,
+    max_concurrency: int = MAX_CONCURRENCY,
+    verbose: bool = True,
+) -> list[List[Dict]]:
+    """
+    Fetch every company concurrently and return one row list per company.
+
+    ``fetch_company`` is called as ``fetch_company(cik, ticker)``. At most
+    ``max_concurrency`` calls are in flight at once. ``verbose=False`` drops
+    the per-company progress line.
+    """
+    max_concurrency = max(1, max_concurrency)
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        async def run_one(ticker: str, cik: str) -> List[Dict]:
+            async with semaphore:
+                if verbose:
+                    print(f"Fetching: {ticker} ({cik})")
+                return await loop.run_in_executor(executor, fetch_company, cik, ticker)
+
+        # gather() keeps input order regardless of completion order
+        return await asyncio.gather(
+            *(run_one(ticker, cik) for ticker, cik in companies.items())
+        )
+
+
+def fetch_companies_concurrently(
+    companies: Mapping[str, str],
+    fetch_company: CompanyFetcher,
+    max_concurrency: int = MAX_CONCURRENCY,
+    verbose: bool = True,
+) -> list[List[Dict]]:
+    """
+    Synchronous wrapper around ``fetch_companies_async``.
+
+    Works from plain scripts and from environments that already run an event
+    loop (e.g. Jupyter), where the coroutine is executed on a helper thread.
+    """
+    coro = fetch_companies_async(companies, fetch_company, max_concurrency, verbose)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    result: dict[str, object] = {}
+
+    def runner() -> None:
+        try:
+            result["value"] = asyncio.run(coro)
+        except BaseException as exc:  # re-raised in the calling thread
+            result["error"] = exc
+
+    thread = threading.Thread(target=runner)
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]  # type: ignore[misc]
+    return result["value"]  # type: ignore[return-value]
+
+
+def iter_companies_concurrently(
+    companies: Mapping[str, str],
+    fetch_company: Callable[[str, str], Any],
+    max_concurrency: int = MAX_CONCURRENCY,
+) -> Iterator[tuple[int, Any]]:
+    """
+    Yield ``(position, result)`` for each company as soon as it finishes.
+
+    Unlike ``fetch_companies_concurrently`` nothing is held back until the
+    whole universe is done, and at most ``max_concurrency`` companies are
+    submitted at a time, so a consumer that writes results out as they
+    arrive keeps memory bounded.
+    """
+    items = iter(enumerate(companies.items()))
+    max_concurrency = max(1, max_concurrency)
+    in_flight: dict[Future, int] = {}
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        while True:
+            while len(in_flight) < max_concurrency:
+                position, item = next(items, (None, None))
+                if item is None:
+                    break
+                ticker, cik = item
+                print(f"Fetching: {ticker} ({cik})")
+                in_flight[executor.submit(fetch_company, cik, ticker)] = position
+            if not in_flight:
+                return
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield in_flight.pop(future), future.result()
+
+
+def iter_fetch_parse_pipeline(
+    companies: Mapping[str, str],
+    download: PayloadDownloader,
+    parse: PayloadParser,
+    max_concurrency: int = MAX_CONCURRENCY,
+    parse_workers: int = PARSE_WORKERS,
+    queue_size: int = PIPELINE_QUEUE_SIZE,
+) -> Iterator[tuple[int, List[Dict]]]:
+    """
+    Yield ``(position, rows)`` for each company as soon as it is parsed.
+
+    ``download(cik, ticker)`` runs on ``max_concurrency`` threads and returns a
+    payload, or None on failure (yielded as a None batch). ``parse(payload,
+    cik, ticker)`` runs in ``parse_workers`` processes and must be a
+    module-level function so it can be pickled.
+
+    Download threads block once ``queue_size`` payloads are waiting, and at
+    most ``2 * parse_workers`` payloads are handed to the pool at a time.
+    Parser processes are spawned rather than forked, since the download
+    threads (and their locks) are already running. Closing the generator
+    early stops the download threads.
+    """
+    items = list(companies.items())
+    max_concurrency = max(1, max_concurrency)
+    parse_workers = max(1, parse_workers)
+    payloads: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+    next_item = iter(enumerate(items))
+    next_item_lock = threading.Lock()
+    stop = threading.Event()
+    finished = object()
+
+    def put(item: Any) -> None:
+        while not stop.is_set():
+            try:
+                payloads.put(item, timeout=_POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def download_worker() -> None:
+        try:
+            while not stop.is_set():
+                with next_item_lock:
+                    position, (ticker, cik) = next(next_item, (None, (None, None)))
+                if position is None:
+                    return
+                print(f"Fetching: {ticker} ({cik})")
+                put((position, ticker, cik, download(cik, ticker)))
+        except BaseException as exc:  # surfaced by the consumer below
+            put(exc)
+        finally:
+            put(finished)
+
+    in_flight: dict[Future, int] = {}
+    max_in_flight = 2 * parse_workers
+
+    with ProcessPoolExecutor(max_workers=parse_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        threads = [
+            threading.Thread(target=download_worker, daemon=True)
+            for _ in range(min(max_concurrency, len(items)) or 1)
+        ]
+        for thread in threads:
+            thread.start()
+        running = len(threads)
+
+        try:
+            while running or in_flight:
+                if not running or len(in_flight) >= max_in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                else:
+                    # Take the next payload, but keep collecting parse results meanwhile
+                    try:
+                        item = payloads.get(timeout=_POLL_SECONDS if in_flight else None)
+                    except queue.Empty:
+                        item = None
+                    if item is finished:
+                        running -= 1
+                    elif isinstance(item, BaseException):
+                        raise item
+                    elif item is not None:
+                        position, ticker, cik, payload = item
+                        if payload is None:
+                            yield position, None
+                        else:
+                            in_flight[pool.submit(parse, payload, cik, ticker)] = position
+                    done = wait(in_flight, timeout=0).done if in_flight else set()
+
+                for future in done:
+                    yield in_flight.pop(future), future.result()
+        finally:
+            stop.set()
+            for future in in_flight:
+                future.cancel()
+
+
+def fetch_parse_pipeline(
+    companies: Mapping[str, str],
+    download: PayloadDownloader,
+    parse: PayloadParser,
+    max_concurrency: int = MAX_CONCURRENCY,
+    parse_workers: int = PARSE_WORKERS,
+    queue_size: int = PIPELINE_QUEUE_SIZE,
+) -> list[List[Dict]]:
+    """Run ``iter_fetch_parse_pipeline`` and return row batches in ``companies`` order."""
+    results: list[List[Dict]] = [[] for _ in companies]
+    for position, rows in iter_fetch_parse_pipeline(
+        companies, download, parse, max_concurrency, parse_workers, queue_size
+    ):
+        results[position] = rows or []
+    return results
@@ -0,0 +1,92 @@
+"""
+Persistent record of companies whose fetch failed.
+
+Every time a company's companyfacts download fails for good, its CIK is
+written to ``.sec_cache/dead_letters.json`` with the ticker, the failure
+reason, the HTTP status (if any), whether a retry can't help (``permanent``,
+e.g. a 404 for an unknown CIK) and how many runs have failed on it. A later
+successful fetch removes the entry.
+
+``py fetchAllData.py --retry-failed`` refetches only the companies in the
+queue and merges them into the existing long/wide outputs.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from responseCache import CACHE_DIR, atomic_write
+
+DEAD_LETTERS_PATH = Path(os.getenv("SEC_API_DEAD_LETTERS", str(CACHE_DIR / "dead_letters.json")))
+
+
+class DeadLetterQueue:
+    """JSON file mapping zero-padded CIK -> last failure."""
+
+    def __init__(self, path: Path = DEAD_LETTERS_PATH) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict[str, Any]] | None = None
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        if self._entries is None:
+            try:
+                self._entries = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self) -> None:
+        try:
+            atomic_write(self.path, json.dumps(self._entries, indent=2, sort_keys=True).encode("utf-8"))
+        except OSError as err:
+            print(f"[WARN] Could not write dead-letter queue {self.path}: {err}")
+
+    def record(self, cik: str, ticker: str, reason: str, status: int | None = None, permanent: bool = False) -> None:
+        """Add or update the failure entry for ``cik``."""
+        cik = cik.zfill(10)
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            entries = self._load()
+            previous = entries.get(cik, {})
+            entries[cik] = {
+                "ticker": ticker,
+                "reason": reason,
+                "status": status,
+                "permanent": permanent,
+                "attempts": previous.get("attempts", 0) + 1,
+                "first_failed": previous.get("first_failed", now),
+                "last_failed": now,
+            }
+            self._save()
+
+    def resolve(self, cik: str) -> None:
+        """Drop ``cik`` from the queue after a successful fetch."""
+        cik = cik.zfill(10)
+        with self._lock:
+            entries = self._load()
+            if entries.pop(cik, None) is not None:
+                self._save()
+
+    def entries(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            return dict(self._load())
+
+    def companies(self) -> dict[str, str]:
+        """Queued companies as ``{ticker: CIK}``, ready for ``get_all_fundamentals``."""
+        return {entry["ticker"]: cik for cik, entry in self.entries().items()}
+
+    def permanent(self) -> set[str]:
+        """CIKs whose last failure was permanent (retrying won't help)."""
+        return {cik for cik, entry in self.entries().items() if entry.get("permanent")}
+
+    def __len__(self) -> int:
+        return len(self.entries())
+
+
+DEAD_LETTERS = DeadLetterQueue()
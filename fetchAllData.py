@@ -1,30 +1,30 @@
+import argparse
 import os
-import time
-from typing import Dict, List
+from pathlib import Path
+from typing import Dict, Iterator, List
 
 # Set SSL verification to false by default (can be overridden by environment variable)
 if "SEC_API_VERIFY_SSL" not in os.environ:
     os.environ["SEC_API_VERIFY_SSL"] = "false"
 
+import numpy as np
 import pandas as pd
-import requests
-from requests import Response
-from requests.exceptions import RequestException
-
-HEADERS = {
-    "User-Agent": os.getenv(
-        "SEC_API_USER_AGENT",
-        "contact@example.com"  # Replace with your email per SEC guidance
-    )
-}
 
-MAX_RETRIES = 3
-RETRY_BACKOFF_SECONDS = 3
-REQUEST_TIMEOUT = 30  # seconds
-
-VERIFY_SSL = os.getenv("SEC_API_VERIFY_SSL", "false").lower() not in {"0", "false", "no"}
-CUSTOM_CA_BUNDLE = os.getenv("SEC_API_CA_BUNDLE")
-VERIFY_PARAM = CUSTOM_CA_BUNDLE if (CUSTOM_CA_BUNDLE and VERIFY_SSL) else VERIFY_SSL
+from checkpoint import CHECKPOINT_ENABLED, RunCheckpoint
+from companyFacts import (
+    CompanyFactsDownload,
+    download_company_facts,
+    fetch_company_facts,
+    parse_company_facts,
+)
+from concurrentFetch import ASYNC_FETCH, PARSE_WORKERS, iter_companies_concurrently, iter_fetch_parse_pipeline
+from deadLetterQueue import DEAD_LETTERS
+from longSchema import CATEGORIES, concat_long, deduplicate_latest, read_long_csv, typed_long, write_csv
+from rateLimit import SEC_CONCURRENCY
+from responseCache import RAW_CACHE
+from secHttp import HEADERS, VERIFY_PARAM, SecFetchError, fetch_with_retry  # noqa: F401 (re-exported)
+from tickerResolver import normalize_companies
+from watchlist import WATCHLIST_PATH, load_watchlist, merge_shard_outputs, parse_shard, shard_companies, shard_path
 
 PREFERRED_UNITS = {
     "EarningsPerShareBasic": ["USD/shares"],
@@ -32,6 +32,11 @@ PREFERRED_UNITS = {
     "CommonStockSharesOutstanding": ["shares", "pure"],
 }
 
+# Write the long CSV in chunks while fetching (see stream_fundamentals)
+STREAM_OUTPUT = os.getenv("SEC_API_STREAM", "false").lower() not in {"0", "false", "no"}
+STREAM_CHUNK_ROWS = int(os.getenv("SEC_API_STREAM_CHUNK_ROWS", "50000"))
+WIDE_INDEX = ["Ticker", "Fiscal Year", "Period"]
+
 # --------------------------------------------------------
 # 1. YOUR COMPANIES (CIK ALREADY PROVIDED)
 # --------------------------------------------------------
@@ -103,32 +108,67 @@ GAAP_TAGS = {
 # --------------------------------------------------------
 
 def get_company_fundamentals(cik: str, ticker: str) -> List[Dict]:
-    url = f"https://data.sec.gov/api/xbrl/companyfacts/CIK{cik.zfill(10)}.json"
-    response = fetch_with_retry(url)
+    facts = fetch_facts(cik, ticker)
+    return build_company_rows(facts, cik, ticker) if facts is not None else []
 
-    if response is None:
-        print(f"[ERROR] Giving up on {ticker} after retries\n")
-        return []
 
-    data = response.json()
-    facts = data.get("facts", {}).get("us-gaap", {})
+def fetch_company_frame(cik: str, ticker: str) -> pd.DataFrame | None:
+    """Like ``get_company_fundamentals``, but a DataFrame, or None when the fetch failed."""
+    facts = fetch_facts(cik, ticker)
+    return build_company_frame(facts, cik, ticker) if facts is not None else None
 
-    rows = []
 
-    for tag, metric_name in GAAP_TAGS.items():
-        if tag not in facts:
-            continue
+def fetch_facts(cik: str, ticker: str) -> Dict | None:
+    """The company's us-gaap facts, or None when the fetch failed (queued in the dead-letter file)."""
+    try:
+        facts = fetch_company_facts(cik, GAAP_TAGS)
+    except SecFetchError as err:
+        give_up(cik, ticker, err)
+        return None
+
+    DEAD_LETTERS.resolve(cik)
+    return facts
+
+
+def download_company(cik: str, ticker: str) -> CompanyFactsDownload | None:
+    """Network half of ``get_company_fundamentals`` (pipeline download stage)."""
+    try:
+        download = download_company_facts(cik, GAAP_TAGS)
+    except SecFetchError as err:
+        give_up(cik, ticker, err)
+        return None
+
+    DEAD_LETTERS.resolve(cik)
+    return download
+
+
+def give_up(cik: str, ticker: str, err: SecFetchError) -> None:
+    """Report a failed company and queue it for ``--retry-failed``."""
+    print(f"[ERROR] Giving up on {ticker} after retries ({err.reason})\n")
+    DEAD_LETTERS.record(cik, ticker, err.reason, err.status, permanent=err.permanent)
 
-        units = facts[tag].get("units", {})
-        unit_key = pick_unit(tag, units)
-        if not unit_key:
-            continue
 
-        for entry in units[unit_key]:
+def parse_company_frame(download: CompanyFactsDownload, cik: str, ticker: str) -> pd.DataFrame:
+    """CPU half of ``get_company_fundamentals`` (runs in a parser process)."""
+    return build_company_frame(parse_company_facts(download, GAAP_TAGS), cik, ticker)
+
+
+def build_company_rows(facts: Dict, cik: str, ticker: str) -> List[Dict]:
+    """
+    Build one row per fact entry from a company's us-gaap facts.
+
+    Values are passed through as they are in the JSON (``val`` stays an int
+    or float, a missing ``fy`` stays None); ``build_company_frame`` builds the
+    same rows as a typed DataFrame.
+    """
+    rows = []
+
+    for tag, unit_key, entries in iter_tag_entries(facts):
+        for entry in entries:
             rows.append({
                 "Ticker": ticker,
                 "CIK": cik,
-                "Metric": metric_name,
+                "Metric": GAAP_TAGS[tag],
                 "GAAPTag": tag,
                 "Value": entry.get("val"),
                 "Fiscal Year": entry.get("fy"),
@@ -141,26 +181,64 @@ def get_company_fundamentals(cik: str, ticker: str) -> List[Dict]:
     return rows
 
 
-def fetch_with_retry(url: str) -> Response | None:
-    """Fetch SEC endpoint with retries and configurable SSL handling."""
-    for attempt in range(1, MAX_RETRIES + 1):
-        try:
-            response = requests.get(
-                url,
-                headers=HEADERS,
-                timeout=REQUEST_TIMEOUT,
-                verify=VERIFY_PARAM,
-            )
-            if response.status_code == 200:
-                return response
-
-            print(f"[WARN] {url} returned {response.status_code} (attempt {attempt})")
-        except RequestException as err:
-            print(f"[WARN] Request error on attempt {attempt}: {err}")
-
-        if attempt < MAX_RETRIES:
-            time.sleep(RETRY_BACKOFF_SECONDS)
-    return None
+def build_company_frame(facts: Dict, cik: str, ticker: str) -> pd.DataFrame:
+    """
+    Build the long-format rows of one company column by column.
+
+    Fact entries are read straight into per-column lists (no dict per row).
+    Ticker, CIK, Metric, GAAPTag and Unit repeat for every entry of a tag, so
+    they are stored as categorical codes; Value and Fiscal Year are float64
+    (missing -> NaN), as they end up after ``pd.DataFrame(rows)``. Each
+    entry's ``accn`` is kept in the in-memory ``Accession`` column.
+    """
+    tags, units_used, counts = [], [], []
+    values, years, periods, dates, forms, accessions = [], [], [], [], [], []
+
+    for tag, unit_key, entries in iter_tag_entries(facts):
+        tags.append(tag)
+        units_used.append(unit_key)
+        counts.append(len(entries))
+        values.extend([entry.get("val") for entry in entries])
+        years.extend([entry.get("fy") for entry in entries])
+        periods.extend([entry.get("fp") for entry in entries])
+        dates.extend([entry.get("end") for entry in entries])
+        forms.extend([entry.get("form") for entry in entries])
+        accessions.extend([entry.get("accn") for entry in entries])
+
+    total = len(values)
+    return pd.DataFrame({
+        "Ticker": repeat_categorical([ticker], [total]),
+        "CIK": repeat_categorical([cik], [total]),
+        "Metric": repeat_categorical([GAAP_TAGS[tag] for tag in tags], counts),
+        "GAAPTag": repeat_categorical(tags, counts),
+        "Value": np.array(values, dtype="float64"),
+        "Fiscal Year": np.array(years, dtype="float64"),
+        "Period": pd.Categorical(periods),
+        "Filing Date": pd.array(dates, dtype=object),
+        "Form": pd.Categorical(forms),
+        "Unit": repeat_categorical(units_used, counts),
+        "Accession": pd.Categorical(accessions),
+    })
+
+
+def iter_tag_entries(facts: Dict) -> Iterator[tuple[str, str, List[Dict]]]:
+    """``(tag, unit, entries)`` for each GAAP tag the company reports, in ``GAAP_TAGS`` order."""
+    for tag in GAAP_TAGS:
+        if tag not in facts:
+            continue
+
+        units = facts[tag].get("units", {})
+        unit_key = pick_unit(tag, units)
+        if unit_key:
+            yield tag, unit_key, units[unit_key]
+
+
+def repeat_categorical(labels: List[str], counts: List[int]) -> pd.Categorical:
+    """``labels[i]`` repeated ``counts[i]`` times, as a categorical with sorted categories."""
+    categories = sorted(set(labels))
+    position = {label: i for i, label in enumerate(categories)}
+    codes = np.repeat(np.array([position[label] for label in labels], dtype="int32"), counts)
+    return pd.Categorical.from_codes(codes, categories=categories)
 
 
 def pick_unit(tag: str, units: Dict) -> str | None:
@@ -183,13 +261,145 @@ def pick_unit(tag: str, units: Dict) -> str | None:
 # 4. PROCESS ALL COMPANIES
 # --------------------------------------------------------
 
-def get_all_fundamentals(companies):
-    all_data = []
+def get_all_fundamentals(
+    companies,
+    use_async: bool = ASYNC_FETCH,
+    parse_workers: int = PARSE_WORKERS,
+    checkpoint: RunCheckpoint | None = None,
+):
+    """
+    Fetch every company and combine the rows into one DataFrame.
+
+    With ``use_async`` the downloads run concurrently (see concurrentFetch.py);
+    rows are still combined in ``companies`` order, so the result matches the
+    serial path. ``parse_workers > 0`` additionally moves parsing into that
+    many processes, fed by the concurrent downloads.
+
+    ``companies`` may be a ticker -> CIK dict (blank CIKs are looked up), a
+    plain list of tickers, or the path of a CSV/YAML watchlist.
+
+    With a ``checkpoint`` each company's rows are saved as soon as they
+    arrive; companies the checkpoint already has are not fetched again and
+    their saved rows are used instead (see checkpoint.py).
+    """
+    if isinstance(companies, (str, Path)):
+        companies = load_watchlist(companies)
+    companies = normalize_companies(companies)
+
+    to_fetch = companies
+    if checkpoint is not None:
+        to_fetch = checkpoint.pending(companies, DEAD_LETTERS.permanent())
+        if len(to_fetch) < len(companies):
+            print(f"Resuming run {checkpoint.run_id}: {len(companies) - len(to_fetch)} of {len(companies)} companies already fetched")
+
+    fetched: Dict[str, pd.DataFrame] = {}
+    for ticker, cik, frame in iter_company_frames(to_fetch, use_async, parse_workers):
+        if checkpoint is not None:
+            checkpoint.record(cik, ticker, frame)
+        if frame is not None:
+            fetched[ticker] = frame
+
+    frames = []
     for ticker, cik in companies.items():
+        if ticker in fetched:
+            frames.append(fetched[ticker])
+        elif checkpoint is not None:
+            frames.append(checkpoint.load_frame(cik))
+    return concat_long(frames)
+
+
+def iter_company_frames(
+    companies: Dict[str, str],
+    use_async: bool = ASYNC_FETCH,
+    parse_workers: int = PARSE_WORKERS,
+) -> Iterator[tuple[str, str, pd.DataFrame | None]]:
+    """
+    Yield ``(ticker, cik, frame)`` for each company as soon as it is fetched.
+
+    ``frame`` is None for a company whose fetch failed. In the concurrent
+    modes companies come out in completion order, not ``companies`` order.
+    Frames are converted to the typed long layout (longSchema.typed_long).
+    """
+    items = list(companies.items())
+    if parse_workers > 0:
+        batches = iter_fetch_parse_pipeline(
+            companies, download_company, parse_company_frame, parse_workers=parse_workers
+        )
+    elif use_async:
+        batches = iter_companies_concurrently(companies, fetch_company_frame)
+    else:
+        batches = None
+
+    if batches is not None:
+        for position, frame in batches:
+            ticker, cik = items[position]
+            yield ticker, cik, typed_long(frame) if frame is not None else None
+        return
+
+    for ticker, cik in items:
         print(f"Fetching: {ticker} ({cik})")
-        rows = get_company_fundamentals(cik, ticker)
-        all_data.extend(rows)
-    return pd.DataFrame(all_data)
+        frame = fetch_company_frame(cik, ticker)
+        yield ticker, cik, typed_long(frame) if frame is not None else None
+
+
+def stream_fundamentals(
+    companies,
+    long_path: str = "fundamentals_long.csv",
+    wide_path: str = "fundamentals_wide.csv",
+    chunk_rows: int = STREAM_CHUNK_ROWS,
+    use_async: bool = ASYNC_FETCH,
+    parse_workers: int = PARSE_WORKERS,
+) -> int:
+    """
+    Fetch ``companies`` and write the long/wide CSVs without holding the universe in memory.
+
+    Each company is deduplicated on its own (the primary key starts with
+    Ticker, so this matches ``save_outputs``) and buffered until
+    ``chunk_rows`` long rows are waiting, then appended to ``long_path``.
+    Only the much smaller per-company wide frames are kept until the end.
+    Long rows are grouped by company in completion order. Returns the
+    number of long rows written.
+    """
+    if isinstance(companies, (str, Path)):
+        companies = load_watchlist(companies)
+    companies = normalize_companies(companies)
+
+    total_rows = 0
+    buffered: List[pd.DataFrame] = []
+    buffered_rows = 0
+    wide_frames: List[pd.DataFrame] = []
+
+    with open(long_path, "w", newline="", encoding="utf-8") as out:
+        def flush() -> None:
+            nonlocal total_rows, buffered_rows
+            if buffered:
+                chunk = concat_long(buffered)
+                write_csv(chunk, out, header=total_rows == 0)
+                total_rows += len(chunk)
+                buffered.clear()
+                buffered_rows = 0
+
+        for ticker, cik, frame in iter_company_frames(companies, use_async, parse_workers):
+            if frame is None or frame.empty:
+                continue
+            df = deduplicate_by_primary_key(frame)
+            wide_frames.append(build_wide(df))
+            buffered.append(df)
+            buffered_rows += len(df)
+            if buffered_rows >= chunk_rows:
+                flush()
+        flush()
+
+    print(f"\n✓ Saved long-format dataset -> {long_path} ({total_rows} rows)")
+
+    if wide_frames:
+        df_wide = pd.concat(wide_frames, ignore_index=True, sort=False)
+        metrics = sorted(col for col in df_wide.columns if col not in WIDE_INDEX + ["Filing Date"])
+        df_wide = df_wide[WIDE_INDEX + metrics + ["Filing Date"]]
+        df_wide = df_wide.sort_values(WIDE_INDEX, kind="stable").reset_index(drop=True)
+        write_csv(df_wide, wide_path)
+        print(f"\n✓ Saved wide-format dataset -> {wide_path} ({len(df_wide)} rows)")
+    return total_rows
 
 
 # --------------------------------------------------------
@@ -199,57 +409,90 @@ def get_all_fundamentals(companies):
 def deduplicate_by_primary_key(df: pd.DataFrame) -> pd.DataFrame:
     """
     Deduplicate using primary key (Ticker + Fiscal Year + Period).
-    For each unique period, keeps only the latest filing (by Filing Date).
+    For each unique period and GAAP tag, keeps only the latest filing (by Filing Date).
     This ensures no duplicate reporting periods while preserving all metrics.
+    Rows keep their original order (see longSchema.deduplicate_latest).
     """
-    if df.empty or "Filing Date" not in df.columns:
-        return df
-    
-    df = df.copy()
-    
-    # Build primary key: Ticker + Fiscal Year + Period
-    def build_primary_key(frame):
-        subset = frame[["Ticker", "Fiscal Year", "Period"]].copy()
-        # Normalize Fiscal Year
-        if "Fiscal Year" in subset.columns:
-            fiscal_numeric = pd.to_numeric(subset["Fiscal Year"], errors="coerce")
-            fiscal_str = fiscal_numeric.astype(object)
-            mask_valid = fiscal_numeric.notna()
-            fiscal_str.loc[mask_valid] = fiscal_numeric.loc[mask_valid].astype(int).astype(str)
-            fiscal_str.loc[~mask_valid] = "<NA>"
-            subset["Fiscal Year"] = fiscal_str
-        # Fill NaN and convert to string
-        for col in subset.columns:
-            if col != "Fiscal Year":
-                subset[col] = subset[col].fillna("<NA>").astype(str).str.strip()
-        return subset.agg("||".join, axis=1)
-    
-    df["_primary_key"] = build_primary_key(df)
-    
-    # Convert Filing Date to datetime for comparison
-    df["Filing Date"] = pd.to_datetime(df["Filing Date"], errors="coerce")
-    
-    # For each primary key (ticker/fiscal year/period), keep only rows with latest filing date
-    # Sort by Filing Date descending, then drop duplicates keeping first (latest)
-    df = df.sort_values(["Filing Date", "GAAPTag"], ascending=[False, True], na_position="last")
-    df = df.drop_duplicates(subset=["_primary_key", "GAAPTag"], keep="first")
-    
-    # Convert Filing Date back to string
-    df["Filing Date"] = df["Filing Date"].dt.strftime("%Y-%m-%d")
-    
-    # Drop temporary column
-    df = df.drop(columns=["_primary_key"])
-    
-    return df.reset_index(drop=True)
+    return deduplicate_latest(df)
 
 
 # --------------------------------------------------------
 # 6. RUN + EXPORT
 # --------------------------------------------------------
 
-def main():
-    df_long = get_all_fundamentals(COMPANIES)
-    
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch SEC fundamentals into fundamentals_long.csv / fundamentals_wide.csv")
+    parser.add_argument("--watchlist", default=WATCHLIST_PATH, help="CSV/YAML watchlist to use instead of COMPANIES")
+    parser.add_argument("--shard", type=parse_shard, metavar="i/N", help="only fetch shard i of N (stable CIK hash) and write *.shard-i-of-N.csv")
+    parser.add_argument("--merge-shards", type=int, metavar="N", help="merge the outputs of N shards and exit")
+    parser.add_argument("--stream", action="store_true", default=STREAM_OUTPUT, help="write rows to the long CSV in chunks as companies finish (bounded memory)")
+    parser.add_argument("--retry-failed", action="store_true", help="refetch only companies in the dead-letter queue and merge them into the outputs")
+    args = parser.parse_args(argv)
+
+    if args.merge_shards:
+        merge_shard_outputs(args.merge_shards)
+        return
+
+    if args.retry_failed:
+        companies = DEAD_LETTERS.companies()
+    else:
+        companies = load_watchlist(args.watchlist) if args.watchlist else normalize_companies(COMPANIES)
+    long_path, wide_path = "fundamentals_long.csv", "fundamentals_wide.csv"
+    if args.shard:
+        index, count = args.shard
+        companies = shard_companies(companies, index, count)
+        long_path, wide_path = shard_path(long_path, index, count), shard_path(wide_path, index, count)
+        print(f"Shard {index}/{count}: {len(companies)} companies")
+
+    if args.retry_failed:
+        retry_failed(companies, long_path, wide_path)
+        return
+
+    if args.stream:
+        stream_fundamentals(companies, long_path, wide_path)
+        CATEGORIES.save()
+        print(f"Raw response cache: {RAW_CACHE.stats.summary()}")
+        print(f"Concurrency: {SEC_CONCURRENCY.summary()}")
+        return
+
+    checkpoint = RunCheckpoint.for_run(__file__, companies, GAAP_TAGS) if CHECKPOINT_ENABLED else None
+    df_long = get_all_fundamentals(companies, checkpoint=checkpoint)
+    print(f"Raw response cache: {RAW_CACHE.stats.summary()}")
+    print(f"Concurrency: {SEC_CONCURRENCY.summary()}")
+    save_outputs(df_long, long_path, wide_path)
+    if checkpoint is not None:
+        # Permanently failing companies (e.g. 404) don't keep the checkpoint alive
+        if checkpoint.pending(companies, DEAD_LETTERS.permanent()):
+            print(f"\n⚠ Checkpoint {checkpoint.run_id} kept ({checkpoint.summary()}); rerun to retry the failed companies")
+        else:
+            checkpoint.clear()
+
+
+def retry_failed(companies: Dict[str, str], long_path: str = "fundamentals_long.csv", wide_path: str = "fundamentals_wide.csv"):
+    """Refetch dead-lettered ``companies`` and merge them into the existing outputs."""
+    if not companies:
+        print("No failed companies to retry.")
+        return
+    print(f"Retrying {len(companies)} failed companies: {', '.join(companies)}")
+
+    fresh = get_all_fundamentals(companies)
+    if fresh.empty:
+        print(f"\n⚠ Nothing recovered; {len(DEAD_LETTERS)} companies still in the dead-letter queue")
+        return
+
+    existing = read_long_csv(long_path) if os.path.exists(long_path) else pd.DataFrame()
+    if not existing.empty:
+        existing = existing[~existing["Ticker"].isin(fresh["Ticker"].unique())]
+    recovered = fresh["Ticker"].nunique()
+    print(f"\n✓ Recovered {recovered} companies ({len(fresh)} rows); {len(DEAD_LETTERS)} still failing")
+    save_outputs(concat_long([existing, fresh]), long_path, wide_path)
+
+
+def save_outputs(df_long: pd.DataFrame, long_path: str = "fundamentals_long.csv", wide_path: str = "fundamentals_wide.csv"):
+    """Deduplicate the long rows and write the long and wide CSVs."""
+    df_long = typed_long(df_long)
+    CATEGORIES.save()
+
     # Deduplicate using primary key (keeps latest filing for each period)
     before_count = len(df_long)
     df_long = deduplicate_by_primary_key(df_long)
@@ -258,30 +501,35 @@ def main():
     if before_count != after_count:
         print(f"\n✓ Removed {before_count - after_count} duplicate periods (kept latest filing for each period)")
     
-    df_long.to_csv("fundamentals_long.csv", index=False)
+    write_csv(df_long, long_path)
 
-    print(f"\n✓ Saved long-format dataset -> fundamentals_long.csv ({len(df_long)} rows)")
+    print(f"\n✓ Saved long-format dataset -> {long_path} ({len(df_long)} rows)")
     print(df_long.head())
 
     # Optional wide pivot table
+    df_wide = build_wide(df_long)
+    write_csv(df_wide, wide_path)
+
+    print(f"\n✓ Saved wide-format dataset -> {wide_path}")
+    print(df_wide.head())
+
+
+def build_wide(df_long: pd.DataFrame) -> pd.DataFrame:
+    """Pivot long rows to one row per Ticker/Fiscal Year/Period with a Filing Date column."""
     df_wide = df_long.pivot_table(
-        index=["Ticker", "Fiscal Year", "Period"],
+        index=WIDE_INDEX,
         columns="Metric",
         values="Value",
-        aggfunc="last"
+        aggfunc="last",
+        observed=True,
     )
     
     # Add Filing Date as a column (get the latest filing date for each period)
-    filing_dates = df_long.groupby(["Ticker", "Fiscal Year", "Period"])["Filing Date"].max()
+    filing_dates = df_long.groupby(WIDE_INDEX, observed=True)["Filing Date"].max()
     df_wide["Filing Date"] = df_wide.index.map(lambda x: filing_dates.get(x, None))
     
     # Reset index to make Ticker, Fiscal Year, Period regular columns
-    df_wide = df_wide.reset_index()
-
-    df_wide.to_csv("fundamentals_wide.csv", index=False)
-
-    print(f"\n✓ Saved wide-format dataset -> fundamentals_wide.csv")
-    print(df_wide.head())
+    return df_wide.reset_index()
 
 
 if __name__ == "__main__":
@@ -3,7 +3,6 @@ Fetch historical fundamental data up to 2024 only.
 Use this to populate the CSV with historical data for testing incrementalUpdate.py.
 """
 import os
-import time
 from typing import Dict, List
 from datetime import datetime
 
@@ -12,24 +11,18 @@ if "SEC_API_VERIFY_SSL" not in os.environ:
     os.environ["SEC_API_VERIFY_SSL"] = "false"
 
 import pandas as pd
-import requests
-from requests import Response
-from requests.exceptions import RequestException
-
-HEADERS = {
-    "User-Agent": os.getenv(
-        "SEC_API_USER_AGENT",
-        "contact@example.com"  # Replace with your email per SEC guidance
-    )
-}
-
-MAX_RETRIES = 3
-RETRY_BACKOFF_SECONDS = 3
-REQUEST_TIMEOUT = 30  # seconds
 
-VERIFY_SSL = os.getenv("SEC_API_VERIFY_SSL", "false").lower() not in {"0", "false", "no"}
-CUSTOM_CA_BUNDLE = os.getenv("SEC_API_CA_BUNDLE")
-VERIFY_PARAM = CUSTOM_CA_BUNDLE if (CUSTOM_CA_BUNDLE and VERIFY_SSL) else VERIFY_SSL
+from companyFacts import (
+    CompanyFactsDownload,
+    download_company_facts,
+    fetch_company_facts,
+    parse_company_facts,
+)
+from concurrentFetch import ASYNC_FETCH, PARSE_WORKERS, fetch_companies_concurrently, fetch_parse_pipeline
+from rateLimit import SEC_CONCURRENCY
+from responseCache import RAW_CACHE
+from secHttp import HEADERS, VERIFY_PARAM, SecFetchError, fetch_with_retry  # noqa: F401 (re-exported)
+from tickerResolver import normalize_companies
 
 PREFERRED_UNITS = {
     "EarningsPerShareBasic": ["USD/shares"],
@@ -111,16 +104,31 @@ CUTOFF_DATE = datetime(2024, 12, 31)
 # --------------------------------------------------------
 
 def get_company_fundamentals(cik: str, ticker: str) -> List[Dict]:
-    url = f"https://data.sec.gov/api/xbrl/companyfacts/CIK{cik.zfill(10)}.json"
-    response = fetch_with_retry(url)
-
-    if response is None:
-        print(f"[ERROR] Giving up on {ticker} after retries\n")
+    try:
+        facts = fetch_company_facts(cik, GAAP_TAGS)
+    except SecFetchError as err:
+        print(f"[ERROR] Giving up on {ticker} after retries ({err.reason})\n")
         return []
 
-    data = response.json()
-    facts = data.get("facts", {}).get("us-gaap", {})
+    return build_company_rows(facts, cik, ticker)
+
+
+def download_company(cik: str, ticker: str) -> CompanyFactsDownload | None:
+    """Network half of ``get_company_fundamentals`` (pipeline download stage)."""
+    try:
+        return download_company_facts(cik, GAAP_TAGS)
+    except SecFetchError as err:
+        print(f"[ERROR] Giving up on {ticker} after retries ({err.reason})\n")
+        return None
+
+
+def parse_company_rows(download: CompanyFactsDownload, cik: str, ticker: str) -> List[Dict]:
+    """CPU half of ``get_company_fundamentals`` (runs in a parser process)."""
+    return build_company_rows(parse_company_facts(download, GAAP_TAGS), cik, ticker)
+
 
+def build_company_rows(facts: Dict, cik: str, ticker: str) -> List[Dict]:
+    """Build one row per fact entry from a company's us-gaap facts."""
     rows = []
 
     for tag, metric_name in GAAP_TAGS.items():
@@ -174,28 +182,6 @@ def get_company_fundamentals(cik: str, ticker: str) -> List[Dict]:
     return rows
 
 
-def fetch_with_retry(url: str) -> Response | None:
-    """Fetch SEC endpoint with retries and configurable SSL handling."""
-    for attempt in range(1, MAX_RETRIES + 1):
-        try:
-            response = requests.get(
-                url,
-                headers=HEADERS,
-                timeout=REQUEST_TIMEOUT,
-                verify=VERIFY_PARAM,
-            )
-            if response.status_code == 200:
-                return response
-
-            print(f"[WARN] {url} returned {response.status_code} (attempt {attempt})")
-        except RequestException as err:
-            print(f"[WARN] Request error on attempt {attempt}: {err}")
-
-        if attempt < MAX_RETRIES:
-            time.sleep(RETRY_BACKOFF_SECONDS)
-    return None
-
-
 def pick_unit(tag: str, units: Dict) -> str | None:
     """Return the best unit key for a GAAP tag."""
     preferred_units = PREFERRED_UNITS.get(tag, [])
@@ -216,13 +202,25 @@ def pick_unit(tag: str, units: Dict) -> str | None:
 # 4. PROCESS ALL COMPANIES
 # --------------------------------------------------------
 
-def get_all_fundamentals(companies):
+def get_all_fundamentals(companies, use_async: bool = ASYNC_FETCH, parse_workers: int = PARSE_WORKERS):
+    companies = normalize_companies(companies)
     all_data = []
-    for ticker, cik in companies.items():
-        print(f"Fetching: {ticker} ({cik})")
-        rows = get_company_fundamentals(cik, ticker)
-        all_data.extend(rows)
-        print(f"  → Found {len(rows)} rows (filtered to ≤ 2024-12-31)")
+    if use_async or parse_workers > 0:
+        if parse_workers > 0:
+            results = fetch_parse_pipeline(
+                companies, download_company, parse_company_rows, parse_workers=parse_workers
+            )
+        else:
+            results = fetch_companies_concurrently(companies, get_company_fundamentals)
+        for ticker, rows in zip(companies, results):
+            all_data.extend(rows)
+            print(f"  → {ticker}: found {len(rows)} rows (filtered to ≤ 2024-12-31)")
+    else:
+        for ticker, cik in companies.items():
+            print(f"Fetching: {ticker} ({cik})")
+            rows = get_company_fundamentals(cik, ticker)
+            all_data.extend(rows)
+            print(f"  → Found {len(rows)} rows (filtered to ≤ 2024-12-31)")
     
     # Convert to DataFrame and apply additional filter to be absolutely sure
     df = pd.DataFrame(all_data)
@@ -267,6 +265,8 @@ def main():
     print("if it only adds 2025+ data.\n")
     
     df_long = get_all_fundamentals(COMPANIES)
+    print(f"Raw response cache: {RAW_CACHE.stats.summary()}")
+    print(f"Concurrency: {SEC_CONCURRENCY.summary()}")
     
     if df_long.empty:
         print("\n⚠ No data found. Check your connection or SSL settings.")
@@ -0,0 +1,179 @@
+"""
+Per-company filing watermarks from the SEC submissions endpoint.
+
+``data.sec.gov/submissions/CIK##########.json`` is a small document listing a
+company's recent filings. Comparing its newest XBRL accession number with
+the one stored after the last successful incremental run tells us whether
+the (much larger) companyfacts payload can have changed at all, so
+incrementalUpdate.py only downloads companyfacts for companies that filed
+something new.
+
+Only periodic reports (10-K, 10-Q, 20-F, 40-F and their amendments) count:
+8-K cover pages, proxy statements and other inline-XBRL filings never add
+us-gaap facts. A watermark advances once the fetched facts include the
+filing, or after ``SEC_API_WATERMARK_MAX_WAIT_RUNS`` runs without it.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Iterable, Mapping
+
+from concurrentFetch import fetch_companies_concurrently
+from responseCache import CACHE_DIR, atomic_write
+from secHttp import fetch_with_retry
+
+SUBMISSIONS_URL = "https://data.sec.gov/submissions/CIK{cik}.json"
+WATERMARKS_PATH = Path(os.getenv("SEC_API_WATERMARKS", str(CACHE_DIR / "watermarks.json")))
+SKIP_UNCHANGED = os.getenv("SEC_API_SKIP_UNCHANGED", "true").lower() not in {"0", "false", "no"}
+WATERMARK_MAX_WAIT_RUNS = int(os.getenv("SEC_API_WATERMARK_MAX_WAIT_RUNS", "3"))
+
+# Forms whose XBRL carries the financial statements companyfacts is built from
+FINANCIAL_FORMS = frozenset(
+    form + suffix for form in ("10-K", "10-Q", "20-F", "40-F") for suffix in ("", "/A")
+)
+
+# e.g. 0000320193-24-000123 (filer agent CIK, year, sequence)
+ACCESSION_PATTERN = re.compile(r"\d{10}-\d{2}-\d{6}")
+
+
+def submissions_url(cik: str) -> str:
+    return SUBMISSIONS_URL.format(cik=cik.zfill(10))
+
+
+def latest_filing(cik: str) -> dict[str, Any] | None:
+    """
+    Return the newest XBRL periodic report listed for ``cik``.
+
+    Only ``FINANCIAL_FORMS`` with XBRL data can change the us-gaap facts;
+    Form 4s, 8-Ks (even with an inline-XBRL cover page), proxy statements
+    and the like are skipped. The accession is None when no such filing is
+    listed. Returns None if the submissions document could not be fetched.
+    """
+    response = fetch_with_retry(submissions_url(cik))
+    if response is None:
+        return None
+
+    recent = response.json().get("filings", {}).get("recent", {})
+    accessions = recent.get("accessionNumber", [])
+    if not accessions:
+        return {"accession": None, "filing_date": None, "report_date": None, "form": None}
+
+    is_xbrl = recent.get("isXBRL") or [1] * len(accessions)
+    forms = recent.get("form") or [None] * len(accessions)
+    for i in range(len(accessions)):
+        form = forms[i] if i < len(forms) else None
+        if i < len(is_xbrl) and is_xbrl[i] and (form is None or form in FINANCIAL_FORMS):
+            break
+    else:
+        return {"accession": None, "filing_date": None, "report_date": None, "form": None}
+
+    def pick(field: str) -> Any:
+        values = recent.get(field, [])
+        return values[i] if i < len(values) else None
+
+    return {
+        "accession": accessions[i],
+        "filing_date": pick("filingDate"),
+        "report_date": pick("reportDate"),
+        "form": pick("form"),
+    }
+
+
+class WatermarkStore:
+    """JSON file mapping zero-padded CIK -> latest processed filing."""
+
+    def __init__(self, path: Path = WATERMARKS_PATH) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._marks: dict[str, dict[str, Any]] | None = None
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        if self._marks is None:
+            try:
+                self._marks = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self._marks = {}
+        return self._marks
+
+    def get(self, cik: str) -> dict[str, Any] | None:
+        return self._load().get(cik.zfill(10))
+
+    def all(self) -> dict[str, dict[str, Any]]:
+        return dict(self._load())
+
+    def update(self, filings: Mapping[str, Mapping[str, Any]]) -> None:
+        """Record ``filings`` (CIK -> latest filing) and save the file."""
+        with self._lock:
+            marks = self._load()
+            for cik, filing in filings.items():
+                marks[cik.zfill(10)] = dict(filing)
+            self._save()
+
+    def wait(self, filings: Mapping[str, Mapping[str, Any]], max_runs: int = WATERMARK_MAX_WAIT_RUNS) -> dict[str, dict[str, Any]]:
+        """
+        Count another run for each filing the fetched facts did not include yet.
+
+        ``filings`` maps CIK -> filing. The stored watermark is kept; the
+        count lives next to it under ``waiting``. Returns the filings that
+        have now waited ``max_runs`` runs, to be recorded with ``update``
+        anyway (e.g. a report with none of the GAAP_TAGS facts).
+        """
+        overdue = {}
+        with self._lock:
+            marks = self._load()
+            for cik, filing in filings.items():
+                mark = marks.setdefault(cik.zfill(10), {})
+                waiting = mark.get("waiting") or {}
+                runs = waiting.get("runs", 0) + 1 if waiting.get("accession") == filing.get("accession") else 1
+                mark["waiting"] = {"accession": filing.get("accession"), "runs": runs}
+                if runs >= max_runs:
+                    overdue[cik.zfill(10)] = dict(filing)
+            if filings:
+                self._save()
+        return overdue
+
+    def _save(self) -> None:
+        atomic_write(self.path, json.dumps(self._marks, indent=2, sort_keys=True).encode("utf-8"))
+
+
+WATERMARKS = WatermarkStore()
+
+
+def find_changed_companies(
+    companies: Mapping[str, str],
+    store: WatermarkStore = WATERMARKS,
+    always_include: Iterable[str] = (),
+) -> tuple[dict[str, str], dict[str, dict[str, Any]]]:
+    """
+    Split ``companies`` into those that need a companyfacts download.
+
+    Returns ``(changed, latest)`` where ``changed`` keeps the ticker -> CIK
+    entries to fetch and ``latest`` maps CIK -> newest filing seen, for
+    ``WatermarkStore.update`` once the run has been saved. Companies with no
+    stored watermark, a failed submissions lookup, or a ticker listed in
+    ``always_include`` are always fetched.
+    """
+    always_include = set(always_include)
+    filings = fetch_companies_concurrently(
+        companies, lambda cik, ticker: latest_filing(cik), verbose=False
+    )
+
+    changed: dict[str, str] = {}
+    latest: dict[str, dict[str, Any]] = {}
+    for (ticker, cik), filing in zip(companies.items(), filings):
+        stored = store.get(cik)
+        if filing is not None:
+            latest[cik.zfill(10)] = filing
+        if (
+            ticker in always_include
+            or filing is None
+            or stored is None
+            or filing.get("accession") != stored.get("accession")
+        ):
+            changed[ticker] = cik
+    return changed, latest
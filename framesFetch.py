@@ -0,0 +1,160 @@
+"""
+Cross-sectional fetch mode built on the SEC XBRL frames endpoint.
+
+``/api/xbrl/frames/us-gaap/{tag}/{unit}/{period}.json`` returns one tag for
+one calendar period across every filer in a single response. Pulling
+GAAP_TAGS this way costs N_tags x N_periods requests instead of one
+companyfacts request per CIK, which is far cheaper for universes of
+thousands of companies.
+
+Rows use the same long format as ``get_company_fundamentals``, with two
+differences that come from the endpoint itself:
+
+* Fiscal Year / Period are the calendar frame the SEC aligned the fact to
+  (``CY2023`` -> 2023 / FY, ``CY2023Q2`` -> 2023 / Q2), not the fiscal
+  labels of the filing that reported it.
+* Form is empty; frames don't say which filing a value came from.
+
+Usage:
+    python framesFetch.py                 # last five calendar years
+    python framesFetch.py 2015 2024       # explicit year range
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from datetime import date
+from typing import Any, Dict, Iterable, List, Mapping
+
+import pandas as pd
+
+from concurrentFetch import fetch_companies_concurrently
+from fetchAllData import COMPANIES, GAAP_TAGS, PREFERRED_UNITS, save_outputs
+from secHttp import fetch_with_retry
+from tickerResolver import normalize_companies
+
+FRAMES_URL = "https://data.sec.gov/api/xbrl/frames/us-gaap/{tag}/{unit}/{period}.json"
+# Also fetch CY####Q# / CY####Q#I frames (SEC_API_FRAMES_QUARTERLY=false for annual only)
+FRAMES_QUARTERLY = os.getenv("SEC_API_FRAMES_QUARTERLY", "true").lower() not in {"0", "false", "no"}
+
+# Point-in-time tags are published as instant frames (CY####Q#I)
+INSTANT_TAGS = {
+    "Assets",
+    "Liabilities",
+    "StockholdersEquity",
+    "LiabilitiesAndStockholdersEquity",
+    "CashAndCashEquivalentsAtCarryingValue",
+    "AccountsReceivableNetCurrent",
+    "InventoryNet",
+    "AccountsPayableCurrent",
+    "LongTermDebt",
+    "ShortTermBorrowings",
+    "CommonStockSharesOutstanding",
+}
+
+
+def frame_unit(tag: str) -> str:
+    """Unit for ``tag`` as a companyfacts unit key (e.g. ``USD/shares``)."""
+    return PREFERRED_UNITS.get(tag, ["USD"])[0]
+
+
+def frames_url(tag: str, unit: str, period: str) -> str:
+    # The frames API spells ratio units with "-per-" (USD/shares -> USD-per-shares)
+    return FRAMES_URL.format(tag=tag, unit=unit.replace("/", "-per-"), period=period)
+
+
+def frame_periods(tag: str, years: Iterable[int], quarterly: bool = FRAMES_QUARTERLY) -> list[tuple[str, int, str]]:
+    """
+    Return ``(frame, fiscal_year, period)`` for every frame to request.
+
+    Duration tags use ``CY####`` (FY) and ``CY####Q#``; instant tags use
+    ``CY####Q#I``, where the Q4 instant is the year-end balance (FY).
+    """
+    periods = []
+    for year in years:
+        if tag in INSTANT_TAGS:
+            quarters = range(1, 5) if quarterly else [4]
+            for q in quarters:
+                periods.append((f"CY{year}Q{q}I", year, "FY" if q == 4 else f"Q{q}"))
+        else:
+            periods.append((f"CY{year}", year, "FY"))
+            if quarterly:
+                for q in range(1, 5):
+                    periods.append((f"CY{year}Q{q}", year, f"Q{q}"))
+    return periods
+
+
+def fetch_frame(url: str) -> List[Dict[str, Any]]:
+    """Return the ``data`` entries of one frame ([] if unavailable)."""
+    response = fetch_with_retry(url)
+    if response is None:
+        return []
+    return response.json().get("data", [])
+
+
+def get_all_fundamentals_from_frames(
+    companies: Mapping[str, str] | Iterable[str],
+    years: Iterable[int],
+    quarterly: bool = FRAMES_QUARTERLY,
+) -> pd.DataFrame:
+    """
+    Build the long-format dataset for ``companies`` from frames.
+
+    Rows are grouped by company in ``companies`` order, then by GAAP_TAGS
+    order and period, mirroring the per-company fetch.
+    """
+    companies = normalize_companies(companies)
+    years = list(years)
+    by_cik = {int(cik): (ticker, cik) for ticker, cik in companies.items()}
+
+    jobs = {}
+    for tag in GAAP_TAGS:
+        unit = frame_unit(tag)
+        for frame, fiscal_year, period in frame_periods(tag, years, quarterly):
+            jobs[f"{tag}/{frame}"] = (tag, unit, fiscal_year, period, frames_url(tag, unit, frame))
+
+    print(f"Fetching {len(jobs)} frames ({len(GAAP_TAGS)} tags x {len(years)} years)")
+    frames = fetch_companies_concurrently(
+        {label: spec[-1] for label, spec in jobs.items()},
+        lambda url, label: fetch_frame(url),
+        verbose=False,
+    )
+
+    rows_by_cik: Dict[int, List[Dict]] = {cik: [] for cik in by_cik}
+    for (tag, unit, fiscal_year, period, _), data in zip(jobs.values(), frames):
+        for entry in data:
+            cik = entry.get("cik")
+            if cik not in by_cik:
+                continue
+            ticker, cik_str = by_cik[cik]
+            rows_by_cik[cik].append({
+                "Ticker": ticker,
+                "CIK": cik_str,
+                "Metric": GAAP_TAGS[tag],
+                "GAAPTag": tag,
+                "Value": entry.get("val"),
+                "Fiscal Year": fiscal_year,
+                "Period": period,
+                "Filing Date": entry.get("end"),
+                "Form": None,
+                "Unit": unit
+            })
+
+    all_data = []
+    for rows in rows_by_cik.values():
+        all_data.extend(rows)
+    return pd.DataFrame(all_data)
+
+
+def main():
+    this_year = date.today().year
+    start_year = int(sys.argv[1]) if len(sys.argv) > 1 else this_year - 4
+    end_year = int(sys.argv[2]) if len(sys.argv) > 2 else this_year
+
+    df_long = get_all_fundamentals_from_frames(COMPANIES, range(start_year, end_year + 1))
+    save_outputs(df_long)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Offline backfill from the SEC Financial Statement Data Sets.
+
+Each quarterly archive (https://www.sec.gov/dera/data/financial-statement-data-sets,
+e.g. ``2023q4.zip``) holds tab-separated tables; two are needed here:
+
+* ``sub.txt`` - one row per filing (adsh, cik, form, fy, fp). Small; read whole.
+* ``num.txt`` - one row per reported value (adsh, tag, version, ddate, qtrs,
+  uom, value, ...). Several GB uncompressed, so it is read straight from the zip
+  in chunks and every chunk is filtered down to GAAP_TAGS and the companies
+  of interest before anything is kept.
+
+Rows come out in the same long format as ``get_all_fundamentals``: Fiscal
+Year / Period / Form from the filing, Filing Date from the value's ``ddate``
+(period end), and units chosen with ``pick_unit``. Only standard us-gaap
+values for the whole entity are used (no co-registrant or segment rows).
+
+A 10-Q reports flows both for the quarter and year-to-date, with the same
+``ddate``. Only the duration matching the filing's period is kept (``qtrs``
+1 for quarters, 4 for FY, 0 for instant values such as balance-sheet tags),
+so each period gets a single value per tag.
+
+Usage:
+    python fsdsLoader.py 2023q1.zip 2023q2.zip ...          # companies in COMPANIES
+    python fsdsLoader.py --all 2023q1.zip 2023q2.zip ...    # every filer
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+import sys
+import zipfile
+from typing import Iterable, Mapping
+
+import pandas as pd
+
+from fetchAllData import COMPANIES, GAAP_TAGS, pick_unit, save_outputs
+from longSchema import LONG_COLUMNS
+from tickerResolver import TICKER_INDEX, normalize_companies
+
+FSDS_CHUNK_ROWS = int(os.getenv("SEC_API_FSDS_CHUNK_ROWS", "500000"))
+
+SUB_COLUMNS = ["adsh", "cik", "form", "fy", "fp"]
+NUM_COLUMNS = ["adsh", "tag", "version", "ddate", "qtrs", "uom", "value"]
+# Present in some releases only; rows with a value here are not whole-entity facts
+NUM_DIMENSION_COLUMNS = ["coreg", "segments"]
+
+# Duration (num.txt ``qtrs``) of the flow values kept for each fiscal period;
+# instant values (qtrs=0) are always kept. Other periods keep every duration.
+PERIOD_QUARTERS = {"FY": 4, "CY": 4, "Q1": 1, "Q2": 1, "Q3": 1, "Q4": 1, "H1": 2, "H2": 2, "M9": 3}
+
+_READ_OPTIONS = dict(sep="\t", quoting=csv.QUOTE_NONE, encoding="utf-8", encoding_errors="replace")
+
+
+def read_submissions(archive: zipfile.ZipFile, companies: Mapping[str, str] | None) -> pd.DataFrame:
+    """Read ``sub.txt`` and keep the filings of ``companies`` (all if None)."""
+    with archive.open("sub.txt") as handle:
+        sub = pd.read_csv(handle, usecols=SUB_COLUMNS, dtype={"adsh": str, "form": str, "fp": str}, **_READ_OPTIONS)
+
+    sub["CIK"] = sub["cik"].astype("int64").astype(str).str.zfill(10)
+    if companies is None:
+        sub["Ticker"] = sub["CIK"].map(TICKER_INDEX.cik_to_ticker).fillna(sub["CIK"])
+    else:
+        tickers = {cik: ticker for ticker, cik in normalize_companies(companies).items()}
+        sub = sub[sub["CIK"].isin(tickers)].copy()
+        sub["Ticker"] = sub["CIK"].map(tickers)
+    return sub.drop(columns=["cik"])
+
+
+def iter_values(archive: zipfile.ZipFile, adsh: Iterable[str], chunk_rows: int = FSDS_CHUNK_ROWS):
+    """Yield filtered ``num.txt`` chunks: GAAP_TAGS, us-gaap, whole entity, ``adsh`` only."""
+    with archive.open("num.txt") as handle:
+        header = pd.read_csv(handle, nrows=0, **_READ_OPTIONS).columns
+    dimension_columns = [col for col in NUM_DIMENSION_COLUMNS if col in header]
+
+    adsh = set(adsh)
+    with archive.open("num.txt") as handle:
+        for chunk in pd.read_csv(
+            handle,
+            usecols=NUM_COLUMNS + dimension_columns,
+            dtype={"adsh": str, "tag": str, "version": str, "uom": str, "ddate": str},
+            chunksize=chunk_rows,
+            **_READ_OPTIONS,
+        ):
+            mask = (
+                chunk["tag"].isin(GAAP_TAGS)
+                & chunk["adsh"].isin(adsh)
+                & chunk["version"].str.startswith("us-gaap", na=False)
+            )
+            for col in dimension_columns:
+                mask &= chunk[col].isna()
+            if mask.any():
+                yield chunk.loc[mask, NUM_COLUMNS]
+
+
+def load_quarter(path: str, companies: Mapping[str, str] | Iterable[str] | None = COMPANIES, chunk_rows: int = FSDS_CHUNK_ROWS) -> pd.DataFrame:
+    """Return the filtered values of one quarterly archive joined to their filings."""
+    with zipfile.ZipFile(path) as archive:
+        sub = read_submissions(archive, companies)
+        chunks = list(iter_values(archive, sub["adsh"], chunk_rows))
+
+    if not chunks:
+        return pd.DataFrame(columns=NUM_COLUMNS + list(sub.columns))
+    return pd.concat(chunks, ignore_index=True).merge(sub, on="adsh", how="inner")
+
+
+def load_fsds(paths: Iterable[str], companies: Mapping[str, str] | Iterable[str] | None = COMPANIES, chunk_rows: int = FSDS_CHUNK_ROWS) -> pd.DataFrame:
+    """
+    Build the long-format dataset from one or more quarterly archives.
+
+    Units are picked per company and tag across all archives, the same way
+    ``pick_unit`` picks them from companyfacts.
+    """
+    if companies is not None:
+        companies = normalize_companies(companies)
+    frames = []
+    for path in paths:
+        print(f"Loading: {path}")
+        frames.append(load_quarter(path, companies, chunk_rows))
+    values = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if values.empty:
+        return pd.DataFrame(columns=LONG_COLUMNS)
+
+    # Quarter vs year-to-date values share a ddate; keep the period's own duration
+    quarters = pd.to_numeric(values["qtrs"], errors="coerce")
+    expected = values["fp"].map(PERIOD_QUARTERS)
+    values = values[(quarters == 0) | (quarters == expected) | expected.isna()]
+    if values.empty:
+        return pd.DataFrame(columns=LONG_COLUMNS)
+
+    chosen = pd.DataFrame(
+        [
+            (cik, tag, pick_unit(tag, dict.fromkeys(uoms.dropna())))
+            for (cik, tag), uoms in values.groupby(["CIK", "tag"], sort=False)["uom"].unique().items()
+        ],
+        columns=["CIK", "tag", "uom"],
+    )
+    values = values.merge(chosen, on=["CIK", "tag", "uom"], how="inner")
+
+    df = pd.DataFrame({
+        "Ticker": values["Ticker"],
+        "CIK": values["CIK"],
+        "Metric": values["tag"].map(GAAP_TAGS),
+        "GAAPTag": values["tag"],
+        "Value": values["value"],
+        "Fiscal Year": values["fy"],
+        "Period": values["fp"],
+        "Filing Date": pd.to_datetime(values["ddate"], format="%Y%m%d", errors="coerce"),
+        "Form": values["form"],
+        "Unit": values["uom"],
+    })
+
+    # Same grouping as the API fetch: company order, then GAAP_TAGS order
+    tag_order = {tag: i for i, tag in enumerate(GAAP_TAGS)}
+    company_order = {ticker: i for i, ticker in enumerate(companies)} if companies is not None else {}
+    df["_company"] = df["Ticker"].map(company_order) if company_order else df["CIK"]
+    df["_tag"] = df["GAAPTag"].map(tag_order)
+    df = df.sort_values(["_company", "_tag"], kind="stable").drop(columns=["_company", "_tag"])
+    return df.reset_index(drop=True)
+
+
+def main():
+    args = sys.argv[1:]
+    companies = None if "--all" in args else COMPANIES
+    paths = [arg for arg in args if not arg.startswith("--")]
+    if not paths:
+        print("Usage: python fsdsLoader.py [--all] 2023q1.zip [2023q2.zip ...]")
+        return
+
+    df_long = load_fsds(paths, companies)
+    save_outputs(df_long)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ from __future__ import annotations
 import os
 import sys
 from pathlib import Path
-from typing import Iterable
+from typing import Any, Iterable, Mapping
 
 # Set SSL verification to false by default (can be overridden by environment variable)
 if "SEC_API_VERIFY_SSL" not in os.environ:
@@ -12,9 +12,28 @@ if "SEC_API_VERIFY_SSL" not in os.environ:
 import pandas as pd
 
 from fetchAllData import COMPANIES, get_all_fundamentals
+from filingWatermarks import ACCESSION_PATTERN, SKIP_UNCHANGED, WATERMARKS, WatermarkStore, find_changed_companies
+from longSchema import (
+    CATEGORIES,
+    deduplicate_latest,
+    deduplicate_latest_incremental,
+    filing_dates,
+    read_long_csv,
+    row_keys,
+    write_csv,
+)
+from rateLimit import SEC_CONCURRENCY
+from responseCache import RAW_CACHE, RAW_CACHE_ENABLED
+from tickerResolver import normalize_companies
+from watchlist import WATCHLIST_PATH, load_watchlist
 
 FUNDAMENTALS_CSV = Path("fundamentals_long.csv")
 FUNDAMENTALS_WIDE_CSV = Path("fundamentals_wide.csv")
+# This script exists to pick up new filings, so it only reads companyfacts
+# from the raw response cache when asked to (and the cache is not disabled)
+INCREMENTAL_RAW_CACHE = RAW_CACHE_ENABLED and (
+    os.getenv("SEC_API_INCREMENTAL_RAW_CACHE", "false").lower() not in {"0", "false", "no"}
+)
 # Primary key for deduplication: Ticker + Fiscal Year + Period
 # This ensures one row per company/period combination (keeps latest filing)
 PRIMARY_KEY_COLUMNS: Iterable[str] = (
@@ -38,7 +57,7 @@ KEY_COLUMNS: Iterable[str] = (
 def load_existing() -> pd.DataFrame:
     """Load existing CSV and remove any duplicates found in it using primary key."""
     if FUNDAMENTALS_CSV.exists():
-        df = pd.read_csv(FUNDAMENTALS_CSV)
+        df = read_long_csv(FUNDAMENTALS_CSV)
         if not df.empty:
             # Remove duplicates using primary key (keeps latest filing for each period)
             before = len(df)
@@ -47,7 +66,7 @@ def load_existing() -> pd.DataFrame:
             if before != after:
                 print(f"⚠ Found and removed {before - after} duplicate periods from existing CSV (kept latest filings)")
                 # Save the cleaned CSV
-                df.to_csv(FUNDAMENTALS_CSV, index=False)
+                write_csv(df, FUNDAMENTALS_CSV)
         return df
     return pd.DataFrame()
 
@@ -55,113 +74,121 @@ def load_existing() -> pd.DataFrame:
 def build_primary_key(frame: pd.DataFrame) -> pd.Series:
     """
     Build primary key using Ticker + Fiscal Year + Period.
-    This identifies unique reporting periods.
+    This identifies unique reporting periods (uint64 hash, see longSchema.row_keys).
     """
-    if frame.empty:
-        return pd.Series(dtype="string")
-    
-    subset = frame.loc[:, PRIMARY_KEY_COLUMNS].copy()
-    
-    # Normalize Fiscal Year: convert to int if numeric, then to string
-    if "Fiscal Year" in subset.columns:
-        fiscal_numeric = pd.to_numeric(subset["Fiscal Year"], errors="coerce")
-        fiscal_str = fiscal_numeric.astype(object)
-        mask_valid = fiscal_numeric.notna()
-        fiscal_str.loc[mask_valid] = fiscal_numeric.loc[mask_valid].astype(int).astype(str)
-        fiscal_str.loc[~mask_valid] = "<NA>"
-        subset["Fiscal Year"] = fiscal_str
-    
-    # Fill NaN and convert all other columns to string, then strip whitespace
-    for col in subset.columns:
-        if col != "Fiscal Year":
-            subset[col] = subset[col].fillna("<NA>").astype(str).str.strip()
-    
-    return subset.agg("||".join, axis=1)
+    return row_keys(frame, PRIMARY_KEY_COLUMNS)
 
 
 def build_keys(frame: pd.DataFrame) -> pd.Series:
     """
     Create a stable key per row for deduplication.
     Uses full key including metric (GAAPTag) to identify unique metric/period combinations.
+    CSV (float) and API (int) fiscal years hash the same.
     """
-    if frame.empty:
-        return pd.Series(dtype="string")
-    
-    subset = frame.loc[:, KEY_COLUMNS].copy()
-    
-    # Normalize Fiscal Year: convert to int if numeric, then to string
-    # This ensures CSV (float) and API (int) both become the same string
-    if "Fiscal Year" in subset.columns:
-        # Convert to numeric, handling both float and int
-        fiscal_numeric = pd.to_numeric(subset["Fiscal Year"], errors="coerce")
-        # Convert to int where possible, then to string
-        fiscal_str = fiscal_numeric.astype(object)  # Convert to object first to avoid dtype warning
-        mask_valid = fiscal_numeric.notna()
-        fiscal_str.loc[mask_valid] = fiscal_numeric.loc[mask_valid].astype(int).astype(str)
-        fiscal_str.loc[~mask_valid] = "<NA>"
-        subset["Fiscal Year"] = fiscal_str
-    
-    # Fill NaN and convert all other columns to string, then strip whitespace
-    for col in subset.columns:
-        if col != "Fiscal Year":  # Already handled above
-            subset[col] = subset[col].fillna("<NA>").astype(str).str.strip()
-    
-    return subset.agg("||".join, axis=1)
+    return row_keys(frame, KEY_COLUMNS)
 
 
-def get_latest_filing_dates(existing: pd.DataFrame) -> dict[str, str]:
+def get_latest_filing_dates(existing: pd.DataFrame, key: str = "Ticker") -> dict[str, str]:
     """
-    Get the latest filing date for each ticker from existing data.
+    Get the latest filing date for each ticker (or CIK, with ``key="CIK"``) from existing data.
     Returns dict mapping ticker to latest filing date (YYYY-MM-DD format).
     """
-    if existing.empty or "Filing Date" not in existing.columns or "Ticker" not in existing.columns:
+    if existing.empty or "Filing Date" not in existing.columns or key not in existing.columns:
         return {}
     
-    # Convert Filing Date to datetime for comparison
-    existing_copy = existing.copy()
-    existing_copy["Filing Date"] = pd.to_datetime(existing_copy["Filing Date"], errors="coerce")
-    
     # Get latest filing date per ticker
-    latest_dates = existing_copy.groupby("Ticker")["Filing Date"].max()
+    latest_dates = filing_dates(existing).groupby(existing[key], observed=True).max().dropna()
     
     # Convert back to string format (YYYY-MM-DD)
-    result = {}
-    for ticker, date in latest_dates.items():
-        if pd.notna(date):
-            result[ticker] = date.strftime("%Y-%m-%d")
-    
-    return result
+    return latest_dates.dt.strftime("%Y-%m-%d").to_dict()
 
 
-def filter_to_new_filings(fresh: pd.DataFrame, latest_dates: dict[str, str]) -> pd.DataFrame:
+def watermark_date(watermark, report_dates: Mapping[str, str] | None = None) -> pd.Timestamp | None:
+    """
+    Resolve one watermark to the period-end date rows are compared against.
+
+    A watermark may be a date (``"2024-06-30"``), a stored filing from
+    filingWatermarks (its ``report_date`` is used), or an accession number,
+    looked up in ``report_dates`` (accession -> report date). Returns None
+    when it can't be resolved, in which case no rows are filtered out for
+    that company.
+    """
+    if isinstance(watermark, Mapping):
+        watermark = watermark.get("report_date")
+    elif isinstance(watermark, str) and ACCESSION_PATTERN.fullmatch(watermark.strip()):
+        watermark = (report_dates or {}).get(watermark.strip())
+    if not watermark:
+        return None
+    date = pd.to_datetime(watermark, errors="coerce")
+    return date if pd.notna(date) else None
+
+
+def filter_to_new_filings(
+    fresh: pd.DataFrame,
+    latest_dates: Mapping[str, Any],
+    key: str = "Ticker",
+    store: WatermarkStore = WATERMARKS,
+) -> pd.DataFrame:
     """
     Filter fresh data to only include filings newer than what's already in CSV.
-    Only keeps rows with Filing Date > latest date for that ticker.
+    Only keeps rows with Filing Date > watermark for that ticker.
+
+    ``latest_dates`` maps Ticker (or zero-padded CIK, with ``key="CIK"``) to a
+    watermark: a date, an accession number or a stored filing (see
+    ``watermark_date``). Rows of companies without a usable watermark are kept.
     """
-    if fresh.empty or "Filing Date" not in fresh.columns or "Ticker" not in fresh.columns:
+    if fresh.empty or "Filing Date" not in fresh.columns or key not in fresh.columns:
         return fresh
     
     if not latest_dates:
         # No existing data, return all fresh data
         return fresh
     
-    fresh_copy = fresh.copy()
-    filing_date_dt = pd.to_datetime(fresh_copy["Filing Date"], errors="coerce")
-    
-    # Create mask for rows that are newer than latest date for that ticker
-    mask = pd.Series(False, index=fresh_copy.index)
-    
-    for ticker, latest_date_str in latest_dates.items():
-        latest_date = pd.to_datetime(latest_date_str)
-        ticker_mask = (fresh_copy["Ticker"] == ticker) & (filing_date_dt > latest_date)
-        mask |= ticker_mask
+    report_dates = {}
+    if any(isinstance(mark, str) and ACCESSION_PATTERN.fullmatch(mark.strip()) for mark in latest_dates.values()):
+        report_dates = {
+            mark["accession"]: mark.get("report_date")
+            for mark in store.all().values() if mark.get("accession")
+        }
+    watermarks = {
+        (str(company).zfill(10) if key == "CIK" else company): watermark_date(watermark, report_dates)
+        for company, watermark in latest_dates.items()
+    }
+    watermarks = pd.Series({company: date for company, date in watermarks.items() if date is not None}, dtype="datetime64[ns]")
     
-    # Also include tickers that don't exist in existing data
-    new_tickers = ~fresh_copy["Ticker"].isin(latest_dates.keys())
-    mask |= new_tickers
+    # One mapped comparison: each row against its own company's watermark.
+    # Map plain values: mapping a categorical key returns a Categorical of dates
+    filing_date_dt = filing_dates(fresh)
+    row_watermark = fresh[key].astype(object).map(watermarks).astype("datetime64[ns]")
+    mask = row_watermark.isna() | (filing_date_dt > row_watermark)
     
-    # Filter and return (Filing Date remains as original string format)
-    return fresh_copy.loc[mask].reset_index(drop=True)
+    # Filter and return (Filing Date keeps its dtype)
+    return fresh.loc[mask].reset_index(drop=True)
+
+
+def confirmed_filings(
+    fresh: pd.DataFrame,
+    latest_filings: Mapping[str, Mapping[str, Any]],
+) -> dict[str, Mapping[str, Any]]:
+    """
+    Keep the entries of ``latest_filings`` (CIK -> newest filing) that the fetched rows already contain.
+
+    companyfacts can trail the submissions feed, so a filing only counts
+    once one of the company's fetched facts carries its accession number.
+    Companies without any filing count once their facts came back.
+    """
+    if fresh.empty or not latest_filings or "Accession" not in fresh.columns:
+        return {}
+    pairs = pd.DataFrame({
+        "CIK": fresh["CIK"].astype(str).str.zfill(10),
+        "Accession": fresh["Accession"].astype(object),
+    }).drop_duplicates()
+    fetched_ciks = set(pairs["CIK"])
+    fetched = set(zip(pairs["CIK"], pairs["Accession"]))
+    return {
+        cik: filing for cik, filing in latest_filings.items()
+        if cik in fetched_ciks and (filing.get("accession") is None or (cik, filing["accession"]) in fetched)
+    }
 
 
 def get_new_rows(existing: pd.DataFrame, fresh: pd.DataFrame) -> pd.DataFrame:
@@ -198,9 +225,9 @@ def get_new_rows(existing: pd.DataFrame, fresh: pd.DataFrame) -> pd.DataFrame:
         return fresh.drop(columns="_key")
 
     # Step 2: Build keys from existing data and filter duplicates
-    existing_keys = set(build_keys(existing))
+    existing_keys = build_keys(existing).unique()
     
-    # Only keep rows whose keys are NOT in existing_keys
+    # Only keep rows whose keys are NOT in existing_keys (integer hash lookup)
     mask = ~fresh["_key"].isin(existing_keys)
     new_rows = fresh.loc[mask].drop(columns="_key")
     
@@ -220,6 +247,8 @@ def log_new_data(new_rows: pd.DataFrame) -> None:
     """Log detailed information about newly added data."""
     if new_rows.empty:
         return
+    if "Filing Date" in new_rows.columns:
+        new_rows = new_rows.assign(**{"Filing Date": filing_dates(new_rows).dt.strftime("%Y-%m-%d")})
     
     print("\n" + "=" * 80)
     print("NEW DATA SUMMARY")
@@ -227,12 +256,14 @@ def log_new_data(new_rows: pd.DataFrame) -> None:
     
     # Summary by ticker
     ticker_counts = new_rows["Ticker"].value_counts().sort_index()
+    ticker_counts = ticker_counts[ticker_counts > 0]  # categoricals count unused categories too
     print(f"\nNew rows by Ticker ({len(ticker_counts)} companies):")
     for ticker, count in ticker_counts.items():
         print(f"  {ticker}: {count} rows")
     
     # Summary by metric
     metric_counts = new_rows["Metric"].value_counts()
+    metric_counts = metric_counts[metric_counts > 0]
     print(f"\nNew rows by Metric ({len(metric_counts)} metrics):")
     for metric, count in metric_counts.items():
         print(f"  {metric}: {count} rows")
@@ -268,32 +299,11 @@ def log_new_data(new_rows: pd.DataFrame) -> None:
 def deduplicate_by_primary_key(df: pd.DataFrame) -> pd.DataFrame:
     """
     Deduplicate using primary key (Ticker + Fiscal Year + Period).
-    For each unique period, keeps only the latest filing (by Filing Date).
+    For each unique period and GAAP tag, keeps only the latest filing (by Filing Date).
     This ensures no duplicate reporting periods while preserving all metrics.
+    Rows keep their original order (see longSchema.deduplicate_latest).
     """
-    if df.empty or "Filing Date" not in df.columns:
-        return df
-    
-    df = df.copy()
-    
-    # Build primary key
-    df["_primary_key"] = build_primary_key(df)
-    
-    # Convert Filing Date to datetime for comparison
-    df["Filing Date"] = pd.to_datetime(df["Filing Date"], errors="coerce")
-    
-    # For each primary key (ticker/fiscal year/period), keep only rows with latest filing date
-    # Sort by Filing Date descending, then drop duplicates keeping first (latest)
-    df = df.sort_values(["Filing Date", "GAAPTag"], ascending=[False, True], na_position="last")
-    df = df.drop_duplicates(subset=["_primary_key", "GAAPTag"], keep="first")
-    
-    # Convert Filing Date back to string
-    df["Filing Date"] = df["Filing Date"].dt.strftime("%Y-%m-%d")
-    
-    # Drop temporary column
-    df = df.drop(columns=["_primary_key"])
-    
-    return df.reset_index(drop=True)
+    return deduplicate_latest(df)
 
 
 def upsert_data(existing: pd.DataFrame, new_rows: pd.DataFrame) -> tuple[pd.DataFrame, dict]:
@@ -305,15 +315,21 @@ def upsert_data(existing: pd.DataFrame, new_rows: pd.DataFrame) -> tuple[pd.Data
     - If it exists but has a newer filing date → UPDATE (replace old with new)
     - If it exists with same or older filing date → SKIP (keep existing)
     
+    ``existing`` is expected to be deduplicated already (``load_existing``
+    does this); only periods touched by new rows are deduplicated again.
+    
     Returns:
         - Updated DataFrame
-        - Dictionary with stats: {'inserted': count, 'updated': count, 'skipped': count}
+        - Dictionary with stats: {'inserted': count, 'updated': count, 'skipped': count,
+          'by_ticker': DataFrame of the same three counts per Ticker}
     """
     if new_rows.empty:
-        return existing, {'inserted': 0, 'updated': 0, 'skipped': 0}
+        none = pd.Series(False, index=new_rows.index)
+        return existing, upsert_stats(new_rows, none, none, none)
     
     if existing.empty:
-        return new_rows, {'inserted': len(new_rows), 'updated': 0, 'skipped': 0}
+        none = pd.Series(False, index=new_rows.index)
+        return new_rows, upsert_stats(new_rows, ~none, none, none)
     
     # Prepare dataframes for comparison
     existing_copy = existing.copy()
@@ -326,79 +342,53 @@ def upsert_data(existing: pd.DataFrame, new_rows: pd.DataFrame) -> tuple[pd.Data
     new_copy["_key"] = new_keys
     
     # Convert Filing Date to datetime for comparison
-    existing_copy["_filing_date_dt"] = pd.to_datetime(existing_copy["Filing Date"], errors="coerce")
-    new_copy["_filing_date_dt"] = pd.to_datetime(new_copy["Filing Date"], errors="coerce")
-    
-    # Create a lookup: for each key, get the latest filing date in existing
-    existing_lookup = existing_copy.groupby("_key")["_filing_date_dt"].max().to_dict()
-    
-    # Categorize new rows
-    inserted_mask = ~new_copy["_key"].isin(existing_lookup.keys())
-    existing_mask = new_copy["_key"].isin(existing_lookup.keys())
-    
-    # For existing keys, check if new filing date is newer
-    update_mask = pd.Series(False, index=new_copy.index)
-    skip_mask = pd.Series(False, index=new_copy.index)
-    
-    for idx in new_copy[existing_mask].index:
-        key = new_copy.loc[idx, "_key"]
-        new_filing_date = new_copy.loc[idx, "_filing_date_dt"]
-        existing_filing_date = existing_lookup[key]
-        
-        if pd.notna(new_filing_date) and pd.notna(existing_filing_date):
-            if new_filing_date > existing_filing_date:
-                update_mask.loc[idx] = True
-            else:
-                skip_mask.loc[idx] = True
-        elif pd.notna(new_filing_date):
-            # New has date, existing doesn't → update
-            update_mask.loc[idx] = True
-        else:
-            # No date or both missing → skip
-            skip_mask.loc[idx] = True
+    existing_copy["_filing_date_dt"] = filing_dates(existing_copy)
+    new_copy["_filing_date_dt"] = filing_dates(new_copy)
+    
+    # Join each new row to the latest filing date stored under its key
+    existing_latest = existing_copy.groupby("_key")["_filing_date_dt"].max()
+    existing_mask = new_copy["_key"].isin(existing_latest.index)
+    existing_filing_date = new_copy["_key"].map(existing_latest)
+    new_filing_date = new_copy["_filing_date_dt"]
+    
+    # Categorize new rows:
+    # - key not stored → insert
+    # - newer date, or a date where the stored row has none → update
+    # - otherwise (same/older date, or no date) → skip
+    inserted_mask = ~existing_mask
+    update_mask = existing_mask & new_filing_date.notna() & (
+        existing_filing_date.isna() | (new_filing_date > existing_filing_date)
+    )
+    skip_mask = existing_mask & ~update_mask
     
     # Build stats
-    stats = {
-        'inserted': inserted_mask.sum(),
-        'updated': update_mask.sum(),
-        'skipped': skip_mask.sum()
-    }
+    stats = upsert_stats(new_copy, inserted_mask, update_mask, skip_mask)
     
     # Remove rows that will be updated from existing
     if update_mask.any():
-        updated_keys = set(new_copy.loc[update_mask, "_key"])
+        updated_keys = new_copy.loc[update_mask, "_key"].unique()
         existing_copy = existing_copy[~existing_copy["_key"].isin(updated_keys)]
     
     # Combine: existing (minus updated) + inserted + updated
-    result_parts = []
+    existing_final = existing_copy.drop(columns=["_key", "_filing_date_dt"])
+    incoming = new_copy.loc[inserted_mask | update_mask].drop(columns=["_key", "_filing_date_dt"])
     
-    # Add existing rows (excluding those that will be updated)
-    if not existing_copy.empty:
-        existing_final = existing_copy.drop(columns=["_key", "_filing_date_dt"])
-        result_parts.append(existing_final)
-    
-    # Add inserted rows
-    if inserted_mask.any():
-        inserted_df = new_copy.loc[inserted_mask].drop(columns=["_key", "_filing_date_dt"])
-        result_parts.append(inserted_df)
-    
-    # Add updated rows
-    if update_mask.any():
-        updated_df = new_copy.loc[update_mask].drop(columns=["_key", "_filing_date_dt"])
-        result_parts.append(updated_df)
-    
-    # Combine all
-    if result_parts:
-        result = pd.concat(result_parts, ignore_index=True)
-    else:
-        result = existing
-    
-    # Final deduplication by primary key (in case of edge cases)
-    result = deduplicate_by_primary_key(result)
+    # Re-deduplicate only the periods the incoming rows touch
+    result = deduplicate_latest_incremental(existing_final, incoming)
     
     return result, stats
 
 
+def upsert_stats(new_rows: pd.DataFrame, inserted: pd.Series, updated: pd.Series, skipped: pd.Series) -> dict:
+    """Totals and per-Ticker counts for the three upsert outcomes."""
+    outcomes = pd.DataFrame({"inserted": inserted, "updated": updated, "skipped": skipped}, index=new_rows.index)
+    tickers = new_rows["Ticker"] if "Ticker" in new_rows.columns else pd.Series(index=new_rows.index, dtype=object)
+    by_ticker = outcomes.groupby(tickers, observed=True).sum()
+    stats = {name: int(count) for name, count in by_ticker.sum().items()}
+    stats['by_ticker'] = by_ticker
+    return stats
+
+
 def append_and_save(existing: pd.DataFrame, new_rows: pd.DataFrame) -> pd.DataFrame:
     """
     Upsert new rows: Insert new data or update existing data if filing date is newer.
@@ -422,12 +412,15 @@ def append_and_save(existing: pd.DataFrame, new_rows: pd.DataFrame) -> pd.DataFr
     total_processed = stats['inserted'] + stats['updated'] + stats['skipped']
     if total_processed > 0:
         print(f"  📈 Total processed: {total_processed} rows")
+        print("\n  By ticker (inserted / updated / skipped):")
+        for ticker, counts in stats['by_ticker'].iterrows():
+            print(f"    {ticker}: {counts['inserted']} / {counts['updated']} / {counts['skipped']}")
 
     updated = updated.sort_values(
         ["Ticker", "Fiscal Year", "Period", "Filing Date"],
         na_position="last",
     )
-    updated.to_csv(FUNDAMENTALS_CSV, index=False)
+    write_csv(updated, FUNDAMENTALS_CSV)
     return updated
 
 
@@ -441,32 +434,52 @@ def rebuild_wide(long_df: pd.DataFrame) -> None:
         columns="Metric",
         values="Value",
         aggfunc="last",
+        observed=True,
     )
     
     # Add Filing Date as a column (get the latest filing date for each period)
     if "Filing Date" in long_df.columns:
-        filing_dates = long_df.groupby(["Ticker", "Fiscal Year", "Period"])["Filing Date"].max()
+        filing_dates = long_df.groupby(["Ticker", "Fiscal Year", "Period"], observed=True)["Filing Date"].max()
         df_wide["Filing Date"] = df_wide.index.map(lambda x: filing_dates.get(x, None))
     
     # Reset index to make Ticker, Fiscal Year, Period regular columns
     df_wide = df_wide.reset_index()
     
-    df_wide.to_csv(FUNDAMENTALS_WIDE_CSV, index=False)
+    write_csv(df_wide, FUNDAMENTALS_WIDE_CSV)
     print(f"Rebuilt wide-format dataset -> {FUNDAMENTALS_WIDE_CSV}")
 
 
 def main():
+    RAW_CACHE.enabled = INCREMENTAL_RAW_CACHE
     existing = load_existing()
     print(f"Loaded {len(existing)} existing rows from {FUNDAMENTALS_CSV}")
     
     # Show latest data in CSV
     if not existing.empty and "Filing Date" in existing.columns:
-        latest_date = pd.to_datetime(existing["Filing Date"], errors="coerce").max()
+        latest_date = filing_dates(existing).max()
         if pd.notna(latest_date):
             print(f"Latest filing date in CSV: {latest_date.strftime('%Y-%m-%d')}")
     
-    fresh = get_all_fundamentals(COMPANIES)
+    # Only download companyfacts for companies whose latest XBRL filing changed
+    universe = load_watchlist(WATCHLIST_PATH) if WATCHLIST_PATH else normalize_companies(COMPANIES)
+    companies = universe
+    latest_filings = {}
+    if SKIP_UNCHANGED:
+        known_tickers = set(existing["Ticker"].unique()) if "Ticker" in existing.columns else set()
+        companies, latest_filings = find_changed_companies(
+            universe,
+            always_include=[ticker for ticker in universe if ticker not in known_tickers],
+        )
+        print(f"Submissions check: {len(companies)} of {len(universe)} companies have new filings")
+        # A cached payload predates the new filing; fetch these from the SEC
+        if RAW_CACHE.enabled:
+            for cik in companies.values():
+                RAW_CACHE.invalidate(f"CIK{cik.zfill(10)}")
+
+    fresh = get_all_fundamentals(companies) if companies else pd.DataFrame()
     print(f"Fetched {len(fresh)} total rows from SEC API (all historical data)")
+    print(f"Raw response cache: {RAW_CACHE.stats.summary()}")
+    print(f"Concurrency: {SEC_CONCURRENCY.summary()}")
 
     new_rows = get_new_rows(existing, fresh)
 
@@ -482,6 +495,24 @@ def main():
         print(f"✓ Total rows in CSV: {len(updated_long)}")
 
     rebuild_wide(updated_long)
+    CATEGORIES.save()
+
+    # Advance watermarks only for filings the fetched facts already include;
+    # the others stay "changed" and are fetched again, for a limited number of runs
+    confirmed = confirmed_filings(fresh, latest_filings)
+    fetched_ciks = set(fresh["CIK"].astype(str).str.zfill(10).unique()) if "CIK" in fresh.columns else set()
+    waiting = {
+        ticker: cik for ticker, cik in companies.items()
+        if cik in latest_filings and cik in fetched_ciks and cik not in confirmed
+    }
+    overdue = WATERMARKS.wait({cik: latest_filings[cik] for cik in waiting.values()})
+    if confirmed or overdue:
+        WATERMARKS.update({**confirmed, **overdue})
+    still_waiting = [ticker for ticker, cik in waiting.items() if cik not in overdue]
+    if still_waiting:
+        print(f"New filings not in companyfacts yet (checked again next run): {', '.join(still_waiting)}")
+    if overdue:
+        print(f"Stopped waiting for filings without GAAP facts: {', '.join(t for t, cik in waiting.items() if cik in overdue)}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,290 @@
+"""
+Shared column types for the long-format dataset.
+
+Ticker, CIK, Metric, GAAPTag, Period, Form and Unit repeat on row after
+row, so the long frame stores them as categoricals. Their categories come
+from one ``CategoryRegistry``, persisted in ``.sec_cache/long_categories.json``:
+each run starts from the values seen by earlier runs and adds any new ones.
+Frames fetched, read back from CSV or combined within a run all use the same
+dtypes, so ``pd.concat`` keeps them categorical instead of falling back to
+object columns.
+
+Categories are kept sorted, so sorting on a categorical column gives the
+same row order as sorting the plain strings.
+
+``typed_long`` also gives the frame a datetime64 ``Filing Date`` and an
+Int16 ``Fiscal Year``. Frames are typed once, when fetched or read from CSV,
+and only ``write_csv`` turns them back into text.
+
+Fetched frames also carry each fact's ``Accession`` number, so
+incrementalUpdate.py can tell whether a filing has reached companyfacts yet.
+It is an in-memory column only: ``write_csv`` leaves it out of the CSVs.
+
+``row_keys`` turns a set of key columns into one uint64 hash per row, so
+deduplication and "is this row already stored?" checks compare integers.
+``deduplicate_latest`` builds on it to keep the latest filing per
+Ticker/Fiscal Year/Period/GAAPTag without sorting the frame.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import CategoricalDtype, is_datetime64_any_dtype
+
+from responseCache import CACHE_DIR, atomic_write
+
+CATEGORY_REGISTRY_PATH = Path(os.getenv("SEC_API_CATEGORY_REGISTRY", str(CACHE_DIR / "long_categories.json")))
+
+LONG_COLUMNS = ["Ticker", "CIK", "Metric", "GAAPTag", "Value", "Fiscal Year", "Period", "Filing Date", "Form", "Unit"]
+CATEGORICAL_COLUMNS = ("Ticker", "CIK", "Metric", "GAAPTag", "Period", "Form", "Unit")
+# Carried on fetched frames but never written out
+INTERNAL_COLUMNS = ("Accession",)
+
+# One row per reporting period and tag survives deduplication
+PRIMARY_KEY_COLUMNS = ("Ticker", "Fiscal Year", "Period")
+DEDUPE_KEY_COLUMNS = PRIMARY_KEY_COLUMNS + ("GAAPTag",)
+
+# Stands in for a missing value in a key, like the "<NA>" of the old string keys
+MISSING_KEY = "<NA>"
+_MISSING_YEAR = np.iinfo("int64").min
+
+
+class CategoryRegistry:
+    """Sorted categories per long-format column, shared across runs."""
+
+    def __init__(self, path: Path = CATEGORY_REGISTRY_PATH) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._categories: dict[str, set[str]] | None = None
+        self._dtypes: dict[str, CategoricalDtype] = {}
+        self._dirty = False
+
+    def _read_file(self) -> dict[str, set[str]]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = {}
+        return {col: set(data.get(col, [])) for col in CATEGORICAL_COLUMNS}
+
+    def _load(self) -> dict[str, set[str]]:
+        if self._categories is None:
+            self._categories = self._read_file()
+        return self._categories
+
+    def dtype(self, column: str) -> CategoricalDtype:
+        """Categorical dtype currently used for ``column``."""
+        with self._lock:
+            return self._dtype(column)
+
+    def _dtype(self, column: str) -> CategoricalDtype:
+        if column not in self._dtypes:
+            self._dtypes[column] = CategoricalDtype(sorted(self._load()[column]))
+        return self._dtypes[column]
+
+    def register(self, frame: pd.DataFrame) -> None:
+        """Add the values of ``frame``'s categorical columns that are not known yet."""
+        with self._lock:
+            categories = self._load()
+            for col in CATEGORICAL_COLUMNS:
+                if col not in frame.columns:
+                    continue
+                series = frame[col]
+                values = series.cat.categories if isinstance(series.dtype, CategoricalDtype) else series.dropna().unique()
+                new = {str(value) for value in values} - categories[col]
+                if new:
+                    categories[col] |= new
+                    self._dtypes.pop(col, None)
+                    self._dirty = True
+
+    def apply(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Return ``frame`` with its categorical columns on the registry dtypes."""
+        self.register(frame)
+        with self._lock:
+            dtypes = {col: self._dtype(col) for col in CATEGORICAL_COLUMNS if col in frame.columns}
+        changed = {col: dtype for col, dtype in dtypes.items() if frame[col].dtype != dtype}
+        if not changed:
+            return frame
+        # Categorical -> categorical only remaps codes; strings are encoded once
+        return frame.astype(changed)
+
+    def save(self) -> None:
+        """Persist new categories, merged with whatever other runs have saved meanwhile."""
+        with self._lock:
+            if not self._dirty:
+                return
+            categories = self._load()
+            for col, values in self._read_file().items():
+                categories[col] |= values
+            self._dtypes.clear()
+            payload = {col: sorted(values) for col, values in categories.items()}
+            try:
+                atomic_write(self.path, json.dumps(payload, indent=1).encode("utf-8"))
+                self._dirty = False
+            except OSError as err:
+                print(f"[WARN] Could not write category registry {self.path}: {err}")
+
+
+CATEGORIES = CategoryRegistry()
+
+
+def filing_dates(frame: pd.DataFrame) -> pd.Series:
+    """``Filing Date`` as datetime64; only parsed if the frame is not typed yet."""
+    series = frame["Filing Date"]
+    if is_datetime64_any_dtype(series.dtype):
+        return series
+    return pd.to_datetime(series, errors="coerce", format="ISO8601")
+
+
+def typed_long(frame: pd.DataFrame, registry: CategoryRegistry = CATEGORIES) -> pd.DataFrame:
+    """
+    Return ``frame`` with the internal long-format dtypes.
+
+    Categorical string columns (registry dtypes), datetime64 ``Filing Date``
+    and nullable Int16 ``Fiscal Year``. Columns already typed are left alone.
+    """
+    frame = registry.apply(frame)
+    converted = {}
+    if "Filing Date" in frame.columns and not is_datetime64_any_dtype(frame["Filing Date"].dtype):
+        converted["Filing Date"] = filing_dates(frame)
+    if "Fiscal Year" in frame.columns and frame["Fiscal Year"].dtype != "Int16":
+        converted["Fiscal Year"] = pd.to_numeric(frame["Fiscal Year"], errors="coerce").astype("Int16")
+    return frame.assign(**converted) if converted else frame
+
+
+def write_csv(frame: pd.DataFrame, path_or_buf, **kwargs) -> None:
+    """
+    Write a long or wide frame the way the CSVs have always looked.
+
+    Dates become ``YYYY-MM-DD`` and Fiscal Year is written as a float
+    (``2023.0``), as it was before the frame was typed. ``INTERNAL_COLUMNS``
+    are dropped.
+    """
+    internal = [col for col in INTERNAL_COLUMNS if col in frame.columns]
+    if internal:
+        frame = frame.drop(columns=internal)
+    if "Fiscal Year" in frame.columns:
+        frame = frame.astype({"Fiscal Year": "float64"})
+    frame.to_csv(path_or_buf, index=False, date_format="%Y-%m-%d", **kwargs)
+
+
+def concat_long(frames: Iterable[pd.DataFrame], registry: CategoryRegistry = CATEGORIES) -> pd.DataFrame:
+    """``pd.concat`` long frames without losing their categorical and typed columns."""
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    for frame in frames:
+        registry.register(frame)
+    return pd.concat([typed_long(frame, registry) for frame in frames], ignore_index=True)
+
+
+def _hash_key_column(series: pd.Series) -> np.ndarray:
+    """uint64 hash per value of one key column, after normalising it."""
+    if series.name == "Fiscal Year":
+        # 2023, 2023.0 and "2023" are the same year
+        years = pd.to_numeric(series, errors="coerce").astype("float64")
+        return pd.util.hash_array(years.fillna(_MISSING_YEAR).to_numpy().astype("int64"))
+
+    if series.name == "Filing Date":
+        # Typed and text dates hash alike; unparseable dates count as missing
+        return pd.util.hash_array(_filing_date_order(series))
+
+    if isinstance(series.dtype, CategoricalDtype):
+        # Hash each category once, then look the hashes up by code
+        categories = series.cat.categories.astype(str).str.strip().to_numpy(dtype=object)
+        hashes = pd.util.hash_array(np.append(categories, MISSING_KEY).astype(object))
+        return hashes[series.cat.codes.to_numpy()]  # code -1 (missing) picks the last one
+
+    values = series.astype(object).fillna(MISSING_KEY).astype(str).str.strip()
+    return pd.util.hash_array(values.to_numpy(dtype=object))
+
+
+def row_keys(frame: pd.DataFrame, columns: Iterable[str]) -> pd.Series:
+    """
+    One uint64 hash per row of ``frame[columns]``.
+
+    Values are normalised the way the old ``"||"``-joined string keys were:
+    strings are stripped, Fiscal Year is compared as an integer, Filing Date
+    as a date, missing values all compare equal, and categorical and object
+    columns holding the same values hash the same. Keys built from different frames
+    can therefore be compared with ``isin`` / merges.
+    """
+    columns = list(columns)
+    if frame.empty:
+        return pd.Series(dtype="uint64", index=frame.index)
+    hashes = pd.DataFrame({col: _hash_key_column(frame[col]) for col in columns}, index=frame.index)
+    return pd.util.hash_pandas_object(hashes, index=False)
+
+
+def _filing_date_order(series: pd.Series) -> np.ndarray:
+    """int64 per row that orders by Filing Date; missing/unparseable dates sort lowest."""
+    if not is_datetime64_any_dtype(series.dtype):
+        series = pd.to_datetime(series, errors="coerce", format="ISO8601")
+    return series.to_numpy(dtype="datetime64[ns]").view("int64")  # NaT is the int64 minimum
+
+
+def latest_positions(frame: pd.DataFrame, columns: Iterable[str] = DEDUPE_KEY_COLUMNS) -> np.ndarray:
+    """
+    Positions (ascending) of the row with the latest Filing Date for each key.
+
+    Groups come from hashing the key columns; the per-group maximum is a
+    hash aggregation, so nothing is sorted. Ties go to the earliest row,
+    and a key whose rows all lack a date keeps its first row.
+    """
+    groups = pd.Series(pd.factorize(row_keys(frame, columns))[0])
+    order = pd.Series(_filing_date_order(frame["Filing Date"]))
+    is_latest = (order == order.groupby(groups).transform("max")).to_numpy()
+    candidates = np.flatnonzero(is_latest)
+    return candidates[~groups.iloc[candidates].duplicated().to_numpy()]
+
+
+def deduplicate_latest(frame: pd.DataFrame, columns: Iterable[str] = DEDUPE_KEY_COLUMNS) -> pd.DataFrame:
+    """
+    Keep the latest filing per Ticker/Fiscal Year/Period/GAAPTag.
+
+    Surviving rows keep their original order and values (Filing Date is not
+    reformatted).
+    """
+    if frame.empty or "Filing Date" not in frame.columns:
+        return frame
+    return frame.iloc[latest_positions(frame, columns)].reset_index(drop=True)
+
+
+def deduplicate_latest_incremental(
+    existing: pd.DataFrame,
+    new_rows: pd.DataFrame,
+    columns: Iterable[str] = DEDUPE_KEY_COLUMNS,
+) -> pd.DataFrame:
+    """
+    ``deduplicate_latest(concat_long([existing, new_rows]))`` for an ``existing`` that is already deduplicated.
+
+    Only the keys present in ``new_rows`` are deduplicated again; existing
+    rows under other keys are passed through untouched. Rows come out as
+    untouched existing rows, then the winners of the touched keys.
+    """
+    if new_rows.empty:
+        return existing
+    if existing.empty:
+        return deduplicate_latest(new_rows, columns)
+    columns = list(columns)
+    touched = row_keys(existing, columns).isin(row_keys(new_rows, columns).unique()).to_numpy()
+    return concat_long([
+        existing[~touched],
+        deduplicate_latest(concat_long([existing[touched], new_rows]), columns),
+    ])
+
+
+def read_long_csv(path: str | Path, registry: CategoryRegistry = CATEGORIES) -> pd.DataFrame:
+    """Read a long-format CSV straight into the typed layout (CIKs zero-padded)."""
+    dtypes = {col: "category" for col in CATEGORICAL_COLUMNS}
+    dtypes["CIK"] = str
+    df = pd.read_csv(path, dtype=dtypes)
+    if "CIK" in df.columns:
+        df["CIK"] = df["CIK"].str.zfill(10)
+    return typed_long(df, registry)
@@ -0,0 +1,278 @@
+"""
+Request-rate limiting for SEC EDGAR fetches.
+
+The SEC asks automated clients to stay at or below 10 requests/second per
+host. Every call to ``fetch_with_retry`` takes a token from
+``SEC_RATE_LIMITER`` before it touches the network, so the ceiling holds no
+matter how many threads are fetching concurrently. By default the bucket
+lives in a lock-protected file in the system temp directory, so separate
+processes on the same host (scripts, notebooks) share the ceiling too.
+
+``SEC_CONCURRENCY`` additionally adapts how many requests may be in flight
+at once (AIMD): it grows while responses come back fast and 200, and is
+halved on 403/429 throttling or latency spikes.
+"""
+
+from __future__ import annotations
+
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import fcntl  # POSIX
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt  # Windows
+except ImportError:
+    msvcrt = None
+
+MAX_REQUESTS_PER_SECOND = float(os.getenv("SEC_API_MAX_RPS", "10"))
+# Share one bucket between every process on this host (SEC_API_SHARED_RATE_LIMIT=false for per-process)
+SHARED_RATE_LIMIT = os.getenv("SEC_API_SHARED_RATE_LIMIT", "true").lower() not in {"0", "false", "no"}
+RATE_LIMIT_FILE = Path(os.getenv(
+    "SEC_API_RATE_LIMIT_FILE",
+    str(Path(tempfile.gettempdir()) / "sec_api_rate_limit.bin"),
+))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Tokens refill continuously at ``rate`` per second up to ``capacity``.
+    ``acquire`` blocks until a token is available, so callers never need to
+    sleep on their own.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Block until ``tokens`` are available, then consume them."""
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class FileTokenBucket:
+    """
+    Token bucket shared by every process on the host.
+
+    The bucket state (tokens, last refill as wall-clock time) lives in a
+    small file and is only read or written under an exclusive file lock, so
+    fetchAllData.py, incrementalUpdate.py and notebook sessions running at
+    the same time draw from one budget. All of them should use the same
+    ``SEC_API_MAX_RPS``.
+
+    Falls back to an in-process ``TokenBucket`` if the file can't be used.
+    """
+
+    _STATE = struct.Struct("<dd")  # tokens, updated (time.time())
+
+    def __init__(self, rate: float, capacity: float = 1.0, path: Path = RATE_LIMIT_FILE) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self.path = Path(path)
+        self._thread_lock = threading.Lock()
+        self._fallback: TokenBucket | None = None
+
+    @contextmanager
+    def _locked(self) -> Iterator[int]:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            elif msvcrt is not None:
+                os.lseek(fd, 0, os.SEEK_SET)
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:  # LK_LOCK gives up after ~10 s
+                        continue
+            try:
+                yield fd
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                elif msvcrt is not None:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+    def _take(self, tokens: float) -> float:
+        """Consume ``tokens`` if available; otherwise return the seconds to wait."""
+        with self._locked() as fd:
+            now = time.time()
+            os.lseek(fd, 0, os.SEEK_SET)
+            data = os.read(fd, self._STATE.size)
+            if len(data) == self._STATE.size:
+                available, updated = self._STATE.unpack(data)
+            else:
+                available, updated = self.capacity, now
+            elapsed = max(0.0, now - updated)
+            available = min(self.capacity, available + elapsed * self.rate)
+
+            wait = 0.0
+            if available >= tokens:
+                available -= tokens
+            else:
+                wait = (tokens - available) / self.rate
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, self._STATE.pack(available, now))
+            return wait
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Block until ``tokens`` are available host-wide, then consume them."""
+        if self._fallback is not None:
+            return self._fallback.acquire(tokens)
+        while True:
+            try:
+                with self._thread_lock:
+                    wait = self._take(tokens)
+            except OSError as err:
+                print(f"[WARN] Shared rate limit file {self.path} unusable ({err}); limiting this process only")
+                self._fallback = TokenBucket(self.rate, self.capacity)
+                return self._fallback.acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+
+# Shared by every fetch on this host (or in this process with SEC_API_SHARED_RATE_LIMIT=false)
+SEC_RATE_LIMITER = (
+    FileTokenBucket(MAX_REQUESTS_PER_SECOND)
+    if SHARED_RATE_LIMIT and (fcntl is not None or msvcrt is not None)
+    else TokenBucket(MAX_REQUESTS_PER_SECOND)
+)
+
+
+# --------------------------------------------------------
+# Adaptive concurrency (AIMD)
+# --------------------------------------------------------
+
+AIMD_ENABLED = os.getenv("SEC_API_AIMD", "true").lower() not in {"0", "false", "no"}
+AIMD_INITIAL_WINDOW = float(os.getenv("SEC_API_AIMD_INITIAL_WINDOW", "4"))
+AIMD_MAX_WINDOW = float(os.getenv("SEC_API_AIMD_MAX_WINDOW", "16"))
+# A response slower than this multiple of the running average counts as a spike
+AIMD_LATENCY_FACTOR = float(os.getenv("SEC_API_AIMD_LATENCY_FACTOR", "3"))
+
+THROTTLE_STATUSES = frozenset({403, 429})
+
+
+class AIMDController:
+    """
+    Additive-increase / multiplicative-decrease limit on requests in flight.
+
+    Callers hold a slot for the duration of one HTTP attempt. Each fast 200
+    grows the window by ``1 / window`` (about +1 per window of successes);
+    a 403/429 or a latency spike multiplies it by ``decrease``, at most once
+    per ``decrease_interval`` so one burst of throttled responses only
+    counts once. The window never leaves ``[minimum, maximum]``.
+
+    Latency is the time to the response headers, so large payloads don't
+    look like spikes.
+    """
+
+    def __init__(
+        self,
+        initial: float = AIMD_INITIAL_WINDOW,
+        minimum: float = 1.0,
+        maximum: float = AIMD_MAX_WINDOW,
+        decrease: float = 0.5,
+        latency_factor: float = AIMD_LATENCY_FACTOR,
+        decrease_interval: float = 1.0,
+        enabled: bool = AIMD_ENABLED,
+    ) -> None:
+        self.minimum = max(1.0, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.decrease_interval = decrease_interval
+        self.enabled = enabled
+        self._window = min(self.maximum, max(self.minimum, initial))
+        self._in_flight = 0
+        self._latency_avg: float | None = None
+        self._samples = 0
+        self._last_decrease = 0.0
+        self._low = self._window
+        self._high = self._window
+        self._decreases = 0
+        self._cond = threading.Condition()
+
+    @property
+    def window(self) -> float:
+        """Current number of requests allowed in flight."""
+        return self._window
+
+    def acquire(self) -> None:
+        """Block until fewer than ``window`` requests are in flight, then take a slot."""
+        with self._cond:
+            while self.enabled and self._in_flight >= int(self._window):
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self, status: int | None, latency: float | None = None) -> None:
+        """Give the slot back and adjust the window from the attempt's outcome."""
+        with self._cond:
+            self._in_flight -= 1
+            spike = (
+                latency is not None
+                and self._latency_avg is not None
+                and self._samples >= 5
+                and latency > self.latency_factor * self._latency_avg
+            )
+            if status in THROTTLE_STATUSES or spike:
+                self._shrink()
+            elif status == 200:
+                self._window = min(self.maximum, self._window + 1.0 / self._window)
+                self._high = max(self._high, self._window)
+            if status == 200 and latency is not None:
+                self._samples += 1
+                self._latency_avg = latency if self._latency_avg is None else 0.9 * self._latency_avg + 0.1 * latency
+            self._cond.notify_all()
+
+    def _shrink(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.decrease_interval:
+            return
+        self._last_decrease = now
+        self._window = max(self.minimum, self._window * self.decrease)
+        self._low = min(self._low, self._window)
+        self._decreases += 1
+
+    def summary(self) -> str:
+        return (
+            f"window {self._window:.1f} (low {self._low:.1f}, high {self._high:.1f}), "
+            f"{self._decreases} decreases"
+        )
+
+
+# Shared by every fetch in this process
+SEC_CONCURRENCY = AIMDController()
@@ -0,0 +1,303 @@
+"""
+Local caches for SEC companyfacts responses.
+
+``ValidatorCache`` keeps each company's ETag / Last-Modified validators next
+to the GAAP facts we extracted from its last full download. The next request
+for that CIK is sent as a conditional GET; when the SEC answers 304 Not
+Modified the stored facts are reused and the multi-MB payload is never
+downloaded or parsed again.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Mapping
+
+CACHE_DIR = Path(os.getenv("SEC_API_CACHE_DIR", ".sec_cache"))
+CONDITIONAL_GET = os.getenv("SEC_API_CONDITIONAL_GET", "true").lower() not in {"0", "false", "no"}
+
+
+@dataclass
+class CachedFacts:
+    etag: str | None
+    last_modified: str | None
+    tags: list[str]
+    facts: dict[str, Any]
+
+    def conditional_headers(self) -> dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def atomic_write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+class ValidatorCache:
+    """Per-CIK store of HTTP validators plus the extracted us-gaap facts."""
+
+    def __init__(self, directory: Path = CACHE_DIR / "validators", enabled: bool = CONDITIONAL_GET) -> None:
+        self.directory = Path(directory)
+        self.enabled = enabled
+
+    def _path(self, cik: str) -> Path:
+        return self.directory / f"CIK{cik.zfill(10)}.json.gz"
+
+    def load(self, cik: str, tags: Iterable[str]) -> CachedFacts | None:
+        """
+        Return the cached entry for ``cik`` if it covers every tag in ``tags``.
+
+        Entries stored for a narrower tag list are ignored, so adding a tag to
+        GAAP_TAGS forces one full download instead of silently missing data.
+        """
+        if not self.enabled:
+            return None
+        path = self._path(cik)
+        if not path.exists():
+            return None
+        try:
+            payload = json.loads(gzip.decompress(path.read_bytes()))
+        except (OSError, ValueError):
+            return None
+
+        cached = CachedFacts(
+            etag=payload.get("etag"),
+            last_modified=payload.get("last_modified"),
+            tags=payload.get("tags", []),
+            facts=payload.get("facts", {}),
+        )
+        if not set(tags) <= set(cached.tags):
+            return None
+        if not (cached.etag or cached.last_modified):
+            return None
+        return cached
+
+    def store(self, cik: str, headers: Mapping[str, str], tags: Iterable[str], facts: dict[str, Any]) -> None:
+        """Persist validators from ``headers`` together with ``facts``."""
+        if not self.enabled:
+            return
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not (etag or last_modified):
+            return
+        payload = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "tags": list(tags),
+            "facts": facts,
+        }
+        try:
+            atomic_write(self._path(cik), gzip.compress(json.dumps(payload).encode("utf-8")))
+        except OSError as err:
+            print(f"[WARN] Could not write validator cache for CIK {cik}: {err}")
+
+
+VALIDATOR_CACHE = ValidatorCache()
+
+
+# --------------------------------------------------------
+# Raw response store (TTL + size-bounded LRU)
+# --------------------------------------------------------
+
+RAW_CACHE_ENABLED = os.getenv("SEC_API_RAW_CACHE", "true").lower() not in {"0", "false", "no"}
+RAW_CACHE_TTL_HOURS = float(os.getenv("SEC_API_RAW_CACHE_TTL_HOURS", "12"))
+RAW_CACHE_MAX_MB = float(os.getenv("SEC_API_RAW_CACHE_MAX_MB", "2048"))
+
+try:
+    import zstandard  # type: ignore
+except ImportError:  # gzip is always available
+    zstandard = None
+
+_MAGIC = b"SECRAW1"
+_HEADER = struct.Struct("<dB")  # stored-at timestamp, codec id
+_STORED_AT = struct.Struct("<d")  # leading field of _HEADER
+_CODEC_GZIP = 0
+_CODEC_ZSTD = 1
+
+
+def _compress(data: bytes) -> tuple[int, bytes]:
+    if zstandard is not None:
+        return _CODEC_ZSTD, zstandard.ZstdCompressor(level=3).compress(data)
+    return _CODEC_GZIP, gzip.compress(data, compresslevel=6)
+
+
+def _decompress(codec: int, data: bytes) -> bytes | None:
+    if codec == _CODEC_GZIP:
+        return gzip.decompress(data)
+    if codec == _CODEC_ZSTD and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompress(data)
+    return None
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    bytes_saved: int = 0
+    evictions: int = 0
+
+    def summary(self) -> str:
+        return (
+            f"{self.hits} hits, {self.misses} misses, "
+            f"{self.bytes_saved / 1_048_576:.1f} MB saved, {self.evictions} evictions"
+        )
+
+
+class RawResponseCache:
+    """
+    Compressed on-disk store of raw companyfacts payloads, keyed by CIK.
+
+    Entries younger than ``ttl_seconds`` are served without touching the
+    network. File mtimes track last access; once the store grows past
+    ``max_bytes`` the least recently used entries are deleted.
+    """
+
+    def __init__(
+        self,
+        directory: Path = CACHE_DIR / "raw",
+        ttl_seconds: float = RAW_CACHE_TTL_HOURS * 3600,
+        max_bytes: int = int(RAW_CACHE_MAX_MB * 1_048_576),
+        enabled: bool = RAW_CACHE_ENABLED,
+    ) -> None:
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._index: dict[str, tuple[float, int]] | None = None  # key -> (last access, size)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.bin"
+
+    def _load_index(self) -> dict[str, tuple[float, int]]:
+        if self._index is None:
+            index = {}
+            if self.directory.exists():
+                for path in self.directory.glob("*.bin"):
+                    try:
+                        stat = path.stat()
+                    except OSError:
+                        continue
+                    index[path.stem] = (stat.st_mtime, stat.st_size)
+            self._index = index
+        return self._index
+
+    def _read(self, key: str) -> tuple[float, bytes] | None:
+        try:
+            blob = self._path(key).read_bytes()
+        except OSError:
+            return None
+        try:
+            if not blob.startswith(_MAGIC):
+                return None
+            stored_at, codec = _HEADER.unpack_from(blob, len(_MAGIC))
+            content = _decompress(codec, blob[len(_MAGIC) + _HEADER.size:])
+        except (OSError, ValueError, EOFError, struct.error):
+            return None
+        if content is None:
+            return None
+        return stored_at, content
+
+    def get(self, key: str) -> bytes | None:
+        """Return the cached payload for ``key`` if it is within the TTL."""
+        if not self.enabled:
+            return None
+        entry = self._read(key)
+        if entry is None or time.time() - entry[0] > self.ttl_seconds:
+            with self._lock:
+                self.stats.misses += 1
+            return None
+
+        now = time.time()
+        with self._lock:
+            self.stats.hits += 1
+            self.stats.bytes_saved += len(entry[1])
+            index = self._load_index()
+            if key in index:
+                index[key] = (now, index[key][1])
+        try:
+            os.utime(self._path(key), (now, now))
+        except OSError:
+            pass
+        return entry[1]
+
+    def put(self, key: str, content: bytes) -> None:
+        """Store ``content`` under ``key`` and evict LRU entries over the size cap."""
+        if not self.enabled:
+            return
+        codec, compressed = _compress(content)
+        blob = _MAGIC + _HEADER.pack(time.time(), codec) + compressed
+        try:
+            atomic_write(self._path(key), blob)
+        except OSError as err:
+            print(f"[WARN] Could not write raw response cache for {key}: {err}")
+            return
+        with self._lock:
+            index = self._load_index()
+            index[key] = (time.time(), len(blob))
+            self._evict(index)
+
+    def _evict(self, index: dict[str, tuple[float, int]]) -> None:
+        total = sum(size for _, size in index.values())
+        if total <= self.max_bytes:
+            return
+        for key, (_, size) in sorted(index.items(), key=lambda item: item[1][0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            total -= size
+            del index[key]
+            self.stats.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        """Drop the entry for ``key`` so the next request goes to the server."""
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as err:
+            print(f"[WARN] Could not drop raw response cache entry {key}: {err}")
+            return
+        with self._lock:
+            self._load_index().pop(key, None)
+
+    def refresh(self, key: str) -> None:
+        """Restart the TTL of an entry the server just confirmed is unchanged."""
+        if not self.enabled:
+            return
+        # Only the stored-at timestamp changes; the payload is left as it is
+        now = time.time()
+        try:
+            with self._path(key).open("r+b") as handle:
+                if handle.read(len(_MAGIC)) != _MAGIC:
+                    return
+                handle.write(_STORED_AT.pack(now))
+        except OSError:
+            return
+        with self._lock:
+            index = self._load_index()
+            if key in index:
+                index[key] = (now, index[key][1])
+
+
+RAW_CACHE = RawResponseCache()
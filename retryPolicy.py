@@ -0,0 +1,133 @@
+"""
+Retry and throttling policy for SEC EDGAR requests.
+
+``RetryPolicy`` decides what to do with each response status:
+
+* 200 / 304 - done.
+* 400, 404, 410, ... - permanent (a bad CIK or a frame that doesn't exist);
+  fail immediately instead of sleeping through retries.
+* 403 / 429 - the SEC is throttling us. Trip ``SEC_CIRCUIT_BREAKER`` so every
+  worker pauses, then retry.
+* 408, 5xx and connection errors - transient; retry with exponential
+  backoff and full jitter.
+
+A ``Retry-After`` header (seconds or HTTP date) always sets the minimum wait.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+MAX_RETRIES = int(os.getenv("SEC_API_MAX_RETRIES", "3"))
+BACKOFF_BASE_SECONDS = float(os.getenv("SEC_API_BACKOFF_BASE", "1"))
+BACKOFF_MAX_SECONDS = float(os.getenv("SEC_API_BACKOFF_MAX", "60"))
+CIRCUIT_COOLDOWN_SECONDS = float(os.getenv("SEC_API_CIRCUIT_COOLDOWN", "30"))
+CIRCUIT_MAX_COOLDOWN_SECONDS = 600.0  # SEC throttling blocks last about 10 minutes
+
+SUCCESS = "success"
+RETRY = "retry"
+THROTTLED = "throttled"
+PERMANENT = "permanent"
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Return a ``Retry-After`` header value in seconds, or None if absent/invalid."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Status classification plus exponential backoff with full jitter."""
+
+    max_attempts: int = MAX_RETRIES
+    backoff_base: float = BACKOFF_BASE_SECONDS
+    backoff_max: float = BACKOFF_MAX_SECONDS
+    success_statuses: frozenset = frozenset({200, 304})
+    throttle_statuses: frozenset = frozenset({403, 429})
+    retry_statuses: frozenset = frozenset({408, 425, 500, 502, 503, 504})
+
+    def classify(self, status: int) -> str:
+        if status in self.success_statuses:
+            return SUCCESS
+        if status in self.throttle_statuses:
+            return THROTTLED
+        if status in self.retry_statuses or status >= 500:
+            return RETRY
+        return PERMANENT
+
+    def backoff(self, attempt: int, retry_after: float | None = None) -> float:
+        """Seconds to wait before attempt ``attempt + 1``."""
+        ceiling = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        delay = random.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+class CircuitBreaker:
+    """
+    Process-wide pause switch for SEC throttling.
+
+    ``trip`` opens the breaker for a cooldown that doubles with every
+    consecutive trip (capped at ``max_cooldown``); ``wait`` blocks callers
+    until it closes again. The first successful response resets the
+    cooldown.
+    """
+
+    def __init__(self, cooldown: float = CIRCUIT_COOLDOWN_SECONDS, max_cooldown: float = CIRCUIT_MAX_COOLDOWN_SECONDS) -> None:
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._open_until = 0.0
+        self._trips = 0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return time.monotonic() < self._open_until
+
+    def trip(self, retry_after: float | None = None) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if now < self._open_until:
+                return  # another worker already opened it
+            pause = min(self.max_cooldown, self.cooldown * 2 ** self._trips)
+            if retry_after is not None:
+                pause = max(pause, retry_after)
+            self._trips += 1
+            self._open_until = now + pause
+        print(f"[WARN] SEC throttling detected; pausing all requests for {pause:.0f}s")
+
+    def record_success(self) -> None:
+        if self._trips:
+            with self._lock:
+                self._trips = 0
+
+    def wait(self) -> None:
+        """Block while the breaker is open."""
+        while True:
+            remaining = self._open_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+
+RETRY_POLICY = RetryPolicy()
+# Shared by every fetch in this process
+SEC_CIRCUIT_BREAKER = CircuitBreaker()
@@ -0,0 +1,222 @@
+"""
+Shared HTTP layer for SEC EDGAR requests.
+
+All fetch scripts go through ``fetch_with_retry`` here, which reuses one
+pooled keep-alive session per process instead of opening a new TCP/TLS
+connection for every companyfacts download. That matters most behind the
+corporate proxy ``VERIFY_PARAM`` exists for, where connection setup is a
+large share of per-company latency.
+
+Set ``SEC_API_HTTP2=true`` to use an HTTP/2 client (requires
+``pip install httpx[http2]``); otherwise a ``requests.Session`` is used.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from typing import Any
+
+import requests
+from requests import Response
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+from requests.structures import CaseInsensitiveDict
+
+from rateLimit import SEC_CONCURRENCY, SEC_RATE_LIMITER
+from responseCache import RAW_CACHE
+from retryPolicy import (
+    PERMANENT,
+    RETRY_POLICY,
+    SEC_CIRCUIT_BREAKER,
+    SUCCESS,
+    THROTTLED,
+    RetryPolicy,
+    parse_retry_after,
+)
+
+HEADERS = {
+    "User-Agent": os.getenv(
+        "SEC_API_USER_AGENT",
+        "contact@example.com"  # Replace with your email per SEC guidance
+    ),
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+REQUEST_TIMEOUT = 30  # seconds
+
+VERIFY_SSL = os.getenv("SEC_API_VERIFY_SSL", "false").lower() not in {"0", "false", "no"}
+CUSTOM_CA_BUNDLE = os.getenv("SEC_API_CA_BUNDLE")
+VERIFY_PARAM = CUSTOM_CA_BUNDLE if (CUSTOM_CA_BUNDLE and VERIFY_SSL) else VERIFY_SSL
+
+# Connections kept open per host; should be >= SEC_API_MAX_CONCURRENCY
+POOL_SIZE = int(os.getenv("SEC_API_POOL_SIZE", "16"))
+USE_HTTP2 = os.getenv("SEC_API_HTTP2", "false").lower() not in {"0", "false", "no"}
+
+# Only companyfacts payloads go through the raw response cache
+_RAW_CACHE_URL = re.compile(r"/api/xbrl/companyfacts/(CIK\d{10})\.json$")
+
+_session: Any = None
+_session_lock = threading.Lock()
+_request_errors: tuple[type[BaseException], ...] = (RequestException,)
+
+
+def _build_requests_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(HEADERS)
+    session.verify = VERIFY_PARAM
+    return session
+
+
+def _build_http2_client() -> Any:
+    """Return an httpx HTTP/2 client, or None if httpx[http2] is unavailable."""
+    global _request_errors
+    try:
+        import h2  # type: ignore  # noqa: F401
+        import httpx  # type: ignore
+    except ImportError:
+        print("[WARN] SEC_API_HTTP2 requires httpx[http2]; falling back to HTTP/1.1")
+        return None
+
+    _request_errors = (RequestException, httpx.HTTPError)
+    limits = httpx.Limits(
+        max_connections=POOL_SIZE,
+        max_keepalive_connections=POOL_SIZE,
+    )
+    return httpx.Client(
+        http2=True,
+        headers=HEADERS,
+        verify=VERIFY_PARAM,
+        limits=limits,
+        timeout=REQUEST_TIMEOUT,
+    )
+
+
+def get_session() -> Any:
+    """Return the process-wide pooled session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                client = _build_http2_client() if USE_HTTP2 else None
+                _session = client if client is not None else _build_requests_session()
+    return _session
+
+
+def close_session() -> None:
+    """Close the shared session and drop its pooled connections."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def _cached_response(url: str, content: bytes) -> Response:
+    """Wrap a cached payload in a Response so callers can't tell the difference."""
+    response = Response()
+    response.status_code = 200
+    response.url = url
+    response.encoding = "utf-8"
+    response.headers = CaseInsensitiveDict({"Content-Type": "application/json", "X-Cache": "HIT"})
+    response._content = content
+    return response
+
+
+class SecFetchError(Exception):
+    """Raised by ``fetch_or_raise`` when a URL can't be fetched."""
+
+    def __init__(self, url: str, status: int | None, reason: str) -> None:
+        super().__init__(f"{url}: {reason}")
+        self.url = url
+        self.status = status
+        self.reason = reason
+
+    @property
+    def permanent(self) -> bool:
+        """True for errors a retry won't fix (e.g. 404 for an unknown CIK)."""
+        return self.status is not None and RETRY_POLICY.classify(self.status) == PERMANENT
+
+
+def fetch_or_raise(
+    url: str,
+    headers: dict[str, str] | None = None,
+    policy: RetryPolicy = RETRY_POLICY,
+) -> Response:
+    """
+    Fetch SEC endpoint with retries and configurable SSL handling.
+
+    ``headers`` are sent in addition to the session defaults. A 304 response
+    is returned as-is, so callers sending conditional headers can reuse their
+    cached copy.
+
+    companyfacts payloads are read from / written to ``RAW_CACHE``; within
+    its TTL no request is made at all.
+
+    Retries follow ``policy``: permanent errors fail at once, 403/429 pause
+    every worker via ``SEC_CIRCUIT_BREAKER``. Each attempt holds a slot of
+    the adaptive ``SEC_CONCURRENCY`` window. Raises ``SecFetchError`` once
+    the request has failed for good.
+    """
+    match = _RAW_CACHE_URL.search(url)
+    cache_key = match.group(1) if match else None
+    if cache_key:
+        content = RAW_CACHE.get(cache_key)
+        if content is not None:
+            return _cached_response(url, content)
+
+    session = get_session()
+    status = None
+    reason = "no attempts made"
+    for attempt in range(1, policy.max_attempts + 1):
+        SEC_CIRCUIT_BREAKER.wait()
+        SEC_CONCURRENCY.acquire()
+        SEC_RATE_LIMITER.acquire()
+        retry_after = None
+        try:
+            response = session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        except _request_errors as err:
+            SEC_CONCURRENCY.release(None)
+            print(f"[WARN] Request error on attempt {attempt}: {err}")
+            status, reason = None, str(err)
+        except BaseException:
+            SEC_CONCURRENCY.release(None)
+            raise
+        else:
+            SEC_CONCURRENCY.release(response.status_code, response.elapsed.total_seconds())
+            status = response.status_code
+            outcome = policy.classify(status)
+            if outcome == SUCCESS:
+                SEC_CIRCUIT_BREAKER.record_success()
+                if cache_key and status == 200:
+                    RAW_CACHE.put(cache_key, response.content)
+                elif cache_key:
+                    RAW_CACHE.refresh(cache_key)
+                return response
+
+            print(f"[WARN] {url} returned {status} (attempt {attempt})")
+            reason = f"HTTP {status}"
+            if outcome == PERMANENT:
+                raise SecFetchError(url, status, reason)
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if outcome == THROTTLED:
+                SEC_CIRCUIT_BREAKER.trip(retry_after)
+
+        if attempt < policy.max_attempts:
+            time.sleep(policy.backoff(attempt, retry_after))
+
+    raise SecFetchError(url, status, f"{reason} after {policy.max_attempts} attempts")
+
+
+def fetch_with_retry(url: str, headers: dict[str, str] | None = None) -> Response | None:
+    """Like ``fetch_or_raise``, but returns None instead of raising."""
+    try:
+        return fetch_or_raise(url, headers=headers)
+    except SecFetchError:
+        return None
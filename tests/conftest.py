@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# The scripts live at the repo root and write their caches on import
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("SEC_API_CACHE_DIR", tempfile.mkdtemp(prefix="sec_cache_"))
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from companyFacts import extract_us_gaap, select_us_gaap
+
+TAGS = ["Revenues", "NetIncomeLoss", "Assets", "EarningsPerShareBasic"]
+
+
+def _units(*values):
+    return {"USD": [{"end": "2023-12-31", "val": value, "accn": "0000000001-24-000001", "fy": 2023, "fp": "FY", "form": "10-K"} for value in values]}
+
+
+def _payload(facts):
+    return {"cik": 1, "entityName": 'Quote "Inc" \\ {Holdings}', "facts": facts}
+
+
+def _encode(data, compact=True):
+    separators = (",", ":") if compact else None
+    return json.dumps(data, separators=separators).encode("utf-8")
+
+
+PAYLOADS = {
+    "plain": _payload({
+        "dei": {"EntityCommonStockSharesOutstanding": {"label": "Shares", "units": {"shares": [{"val": 1}]}}},
+        "us-gaap": {
+            "Assets": {"label": "Assets", "description": "Total", "units": _units(10, 11)},
+            "Revenues": {"label": "Revenues", "units": _units(1.5)},
+            "Other": {"label": "Other", "units": _units(3)},
+        },
+        "srt": {"Revenues": {"label": "srt revenues", "units": _units(99)}},
+    }),
+    "escaped quotes and key-like text in strings": _payload({
+        "us-gaap": {
+            "NetIncomeLoss": {
+                "label": 'Net "Income" ":{"Revenues":{"units":{',
+                "description": 'ends with a backslash \\',
+                "units": _units(-7),
+            },
+            "Revenues": {"label": '\\":{"Assets":{', "description": '"us-gaap":{"Assets":{', "units": _units(42)},
+        },
+    }),
+    "wanted tag only in another taxonomy": _payload({
+        "ifrs-full": {"Revenues": {"label": "ifrs", "units": _units(5)}},
+        "us-gaap": {"Assets": {"label": "Assets", "units": _units(6)}},
+    }),
+    "missing us-gaap": _payload({
+        "dei": {"EntityCommonStockSharesOutstanding": {"label": "Shares", "units": {"shares": [{"val": 1}]}}},
+        "ifrs-full": {"Assets": {"label": "Assets", "units": _units(8)}},
+    }),
+    "dei only": _payload({
+        "dei": {"EntityPublicFloat": {"label": "Float", "units": _units(9)}},
+    }),
+    "no facts": {"cik": 1, "entityName": "Empty", "facts": {}},
+    "unicode": _payload({
+        "us-gaap": {"Revenues": {"label": "Umsätze – “net”", "units": _units(12)}},
+    }),
+}
+
+
+@pytest.mark.parametrize("compact", [True, False], ids=["compact", "spaced"])
+@pytest.mark.parametrize("name", list(PAYLOADS))
+def test_extract_us_gaap_matches_json_selection(name, compact):
+    data = PAYLOADS[name]
+
+    assert extract_us_gaap(_encode(data, compact), TAGS) == select_us_gaap(data, TAGS)
+
+
+def test_missing_us_gaap_and_dei_only_give_no_facts():
+    assert extract_us_gaap(_encode(PAYLOADS["missing us-gaap"]), TAGS) == {}
+    assert extract_us_gaap(_encode(PAYLOADS["dei only"]), TAGS) == {}
+
+
+def test_tag_order_follows_requested_tags():
+    facts = extract_us_gaap(_encode(PAYLOADS["plain"]), ["Revenues", "Assets"])
+
+    assert list(facts) == ["Revenues", "Assets"]
@@ -0,0 +1,26 @@
+import pandas as pd
+
+from fetchAllData import build_company_frame, build_company_rows
+
+FACTS = {
+    "Revenues": {"units": {"USD": [
+        {"val": 5, "fy": 2023, "fp": "FY", "end": "2023-12-31", "form": "10-K", "accn": "0000000001-24-000001"},
+        {"val": 1.5, "fp": "Q1", "end": "2023-03-31", "form": "10-Q", "accn": "0000000001-23-000002"},
+    ]}},
+    "Assets": {"units": {"USD": [{"val": 10**16 + 1, "fy": 2022, "fp": "FY", "end": "2022-12-31", "form": "10-K"}]}},
+}
+
+
+def test_company_rows_keep_json_values():
+    rows = build_company_rows(FACTS, "0000000001", "AAA")
+
+    assert [(row["Value"], row["Fiscal Year"]) for row in rows] == [(5, 2023), (1.5, None), (10**16 + 1, 2022)]
+    assert type(rows[0]["Value"]) is int and type(rows[0]["Fiscal Year"]) is int
+
+
+def test_company_frame_holds_the_same_rows():
+    rows = pd.DataFrame(build_company_rows(FACTS, "0000000001", "AAA"))
+    frame = build_company_frame(FACTS, "0000000001", "AAA").drop(columns=["Accession"])
+
+    pd.testing.assert_frame_equal(frame.astype({col: object for col in frame.select_dtypes("category")}), rows,
+                                  check_dtype=False)
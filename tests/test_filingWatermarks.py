@@ -0,0 +1,70 @@
+import filingWatermarks
+from filingWatermarks import WatermarkStore, find_changed_companies, latest_filing
+
+QUARTERLY = "0000040545-24-000010"
+
+
+class _Response:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+def _submissions(forms, is_xbrl=None):
+    accessions = [QUARTERLY if form == "10-Q" else f"0000040545-24-{i:06d}" for i, form in enumerate(forms, 20)]
+    recent = {
+        "accessionNumber": accessions,
+        "form": forms,
+        "filingDate": ["2024-08-0%d" % (len(forms) - i) for i in range(len(forms))],
+        "reportDate": ["2024-06-30"] * len(forms),
+        "isXBRL": is_xbrl if is_xbrl is not None else [1] * len(forms),
+    }
+    return {"filings": {"recent": recent}}
+
+
+def _serve(monkeypatch, payload):
+    monkeypatch.setattr(filingWatermarks, "fetch_with_retry", lambda url: _Response(payload))
+
+
+def test_newest_8k_is_skipped(monkeypatch):
+    _serve(monkeypatch, _submissions(["8-K", "DEF 14A", "4", "10-Q", "10-K"], is_xbrl=[1, 1, 0, 1, 1]))
+
+    filing = latest_filing("40545")
+
+    assert filing["accession"] == QUARTERLY
+    assert filing["form"] == "10-Q"
+
+
+def test_amendments_count_and_no_report_gives_no_accession(monkeypatch):
+    _serve(monkeypatch, _submissions(["8-K", "10-K/A", "10-Q"]))
+    assert latest_filing("40545")["form"] == "10-K/A"
+
+    _serve(monkeypatch, _submissions(["8-K", "S-8"]))
+    assert latest_filing("40545")["accession"] is None
+
+
+def test_company_with_newest_8k_is_unchanged(monkeypatch, tmp_path):
+    _serve(monkeypatch, _submissions(["8-K", "10-Q"]))
+    store = WatermarkStore(tmp_path / "watermarks.json")
+    store.update({"0000040545": {"accession": QUARTERLY}})
+
+    changed, latest = find_changed_companies({"GE": "0000040545"}, store=store)
+
+    assert changed == {}
+    assert latest["0000040545"]["accession"] == QUARTERLY
+
+
+def test_wait_gives_up_after_max_runs(tmp_path):
+    store = WatermarkStore(tmp_path / "watermarks.json")
+    store.update({"0000040545": {"accession": "old"}})
+    filing = {"accession": "new", "form": "10-Q"}
+
+    assert store.wait({"0000040545": filing}, max_runs=3) == {}
+    assert store.wait({"0000040545": filing}, max_runs=3) == {}
+    assert WatermarkStore(store.path).get("40545")["accession"] == "old"
+    assert store.wait({"0000040545": filing}, max_runs=3) == {"0000040545": filing}
+
+    store.update({"0000040545": filing})
+    assert WatermarkStore(store.path).get("40545") == filing
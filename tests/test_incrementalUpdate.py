@@ -0,0 +1,54 @@
+import pandas as pd
+
+from incrementalUpdate import filter_to_new_filings
+from longSchema import typed_long
+
+
+def _fresh():
+    return typed_long(pd.DataFrame({
+        "Ticker": ["AAA", "AAA", "BBB", "BBB", "CCC"],
+        "CIK": ["0000000001", "0000000001", "0000000002", "0000000002", "0000000003"],
+        "Fiscal Year": [2020, 2021, 2020, 2022, 2022],
+        "Filing Date": ["2020-01-31", "2021-01-31", "2020-01-31", "2022-01-31", "2022-01-31"],
+    }))
+
+
+def _filter_per_ticker(fresh, latest_dates, key="Ticker"):
+    """Reference: the mask built one company at a time."""
+    dates = pd.to_datetime(fresh["Filing Date"])
+    keep = pd.Series(True, index=fresh.index)
+    for company, watermark in latest_dates.items():
+        rows = fresh[key].astype(object) == company
+        keep &= ~rows | (dates > pd.Timestamp(watermark))
+    return fresh.loc[keep].reset_index(drop=True)
+
+
+def test_categorical_tickers_with_distinct_watermarks():
+    fresh = _fresh()
+    assert isinstance(fresh["Ticker"].dtype, pd.CategoricalDtype)
+    latest = {"AAA": "2020-06-30", "BBB": "2021-06-30", "CCC": "2021-12-31"}
+
+    result = filter_to_new_filings(fresh, latest)
+
+    pd.testing.assert_frame_equal(result, _filter_per_ticker(fresh, latest))
+    assert list(result["Ticker"].astype(str)) == ["AAA", "BBB", "CCC"]
+
+
+def test_categorical_cik_key():
+    fresh = _fresh()
+    latest = {"1": "2020-06-30", "0000000002": "2023-01-01", "0000000003": "2021-12-31"}
+
+    result = filter_to_new_filings(fresh, latest, key="CIK")
+
+    assert list(result["Ticker"].astype(str)) == ["AAA", "CCC"]
+
+
+def test_untyped_frame_and_unresolvable_watermark():
+    fresh = pd.DataFrame({
+        "Ticker": ["AAA", "AAA", "BBB"],
+        "Filing Date": ["2020-01-31", "2021-01-31", "2020-01-31"],
+    })
+
+    result = filter_to_new_filings(fresh, {"AAA": "2020-06-30", "BBB": "not a date"})
+
+    assert list(result["Filing Date"]) == ["2021-01-31", "2020-01-31"]
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+from longSchema import (
+    DEDUPE_KEY_COLUMNS,
+    concat_long,
+    deduplicate_latest,
+    deduplicate_latest_incremental,
+    row_keys,
+    typed_long,
+)
+
+
+def _raw_long():
+    return pd.DataFrame({
+        "Ticker": ["AAA", " AAA ", "BBB", None, "BBB", "CCC"],
+        "CIK": ["0000000001", "0000000001", "0000000002", "0000000009", "0000000002", None],
+        "Metric": ["Revenue"] * 6,
+        "GAAPTag": ["Revenues", "Revenues", "Assets", "Revenues", "Assets", "Assets"],
+        "Value": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+        "Fiscal Year": [2022.0, 2022.0, np.nan, 2023.0, 2023.0, 2021.0],
+        "Period": ["FY", "FY", "Q1", "FY", None, "Q2"],
+        "Filing Date": ["2023-02-01", "2023-02-01", None, "2024-02-01", "bad date", "2021-08-01"],
+        "Form": ["10-K", "10-K", "10-Q", "10-K", "10-Q", "10-Q"],
+        "Unit": ["USD"] * 6,
+    })
+
+
+def test_row_keys_match_for_object_and_categorical_frames():
+    raw = _raw_long()
+    typed = typed_long(raw)
+    assert isinstance(typed["Ticker"].dtype, pd.CategoricalDtype)
+
+    for columns in (DEDUPE_KEY_COLUMNS, ["CIK", "Filing Date"], ["Form", "Unit", "Period"]):
+        assert row_keys(raw, columns).tolist() == row_keys(typed, columns).tolist()
+
+
+def test_row_keys_normalise_values():
+    keys = row_keys(_raw_long(), DEDUPE_KEY_COLUMNS)
+
+    assert keys[0] == keys[1]  # whitespace around the ticker is ignored
+    assert keys.nunique() == 5
+
+
+def _random_long(seed, rows=400):
+    rng = np.random.default_rng(seed)
+    dates = ["2022-01-31", "2022-04-30", "2023-01-31", None]  # few dates: many ties and NaT
+    return typed_long(pd.DataFrame({
+        "Ticker": rng.choice(["AAA", "BBB", "CCC"], rows),
+        "CIK": "0000000001",
+        "Metric": "Revenue",
+        "GAAPTag": rng.choice(["Revenues", "Assets", "NetIncomeLoss"], rows),
+        "Value": np.arange(rows, dtype="float64") + 1000 * seed,  # identifies each row
+        "Fiscal Year": rng.choice([2021.0, 2022.0, np.nan], rows),
+        "Period": rng.choice(["FY", "Q1", "Q2"], rows),
+        "Filing Date": rng.choice(np.array(dates, dtype=object), rows),
+        "Form": "10-K",
+        "Unit": "USD",
+    }))
+
+
+def _sorted_dedupe(frame):
+    """Reference: the sort plus drop_duplicates the dedupe engine replaced."""
+    ordered = frame.sort_values("Filing Date", ascending=False, na_position="last", kind="stable")
+    return ordered.drop_duplicates(subset=list(DEDUPE_KEY_COLUMNS), keep="first")
+
+
+def _row_set(frame):
+    return sorted(frame["Value"].tolist())
+
+
+def test_deduplicate_latest_matches_sort_and_drop_duplicates():
+    for seed in range(5):
+        frame = _random_long(seed)
+        assert frame["Filing Date"].isna().any()
+
+        result = deduplicate_latest(frame)
+
+        assert _row_set(result) == _row_set(_sorted_dedupe(frame))
+        assert result["Value"].is_monotonic_increasing  # input order is kept
+
+
+def test_deduplicate_latest_ties_and_missing_dates_keep_first_row():
+    frame = typed_long(pd.DataFrame({
+        "Ticker": ["AAA"] * 5,
+        "GAAPTag": ["Revenues", "Revenues", "Assets", "Assets", "Assets"],
+        "Value": [1.0, 2.0, 3.0, 4.0, 5.0],
+        "Fiscal Year": [2022] * 5,
+        "Period": ["FY"] * 5,
+        "Filing Date": ["2023-02-01", "2023-02-01", None, None, None],
+    }))
+
+    assert _row_set(deduplicate_latest(frame)) == [1.0, 3.0]
+
+
+def test_deduplicate_latest_incremental_matches_full_dedupe():
+    for seed in range(5):
+        existing = deduplicate_latest(_random_long(seed))
+        new_rows = _random_long(seed + 100, rows=60)
+
+        incremental = deduplicate_latest_incremental(existing, new_rows)
+        full = deduplicate_latest(concat_long([existing, new_rows]))
+
+        assert _row_set(incremental) == _row_set(full)
+        pd.testing.assert_frame_equal(
+            incremental.sort_values("Value", ignore_index=True),
+            full.sort_values("Value", ignore_index=True),
+        )
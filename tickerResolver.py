@@ -0,0 +1,127 @@
+"""
+Ticker <-> CIK lookups backed by SEC's ``company_tickers.json``.
+
+The index (about 10k listed filers) is downloaded once and kept in the
+local cache directory; it is refreshed when older than
+``SEC_API_TICKERS_TTL_HOURS``. If a refresh fails, the stale copy is used.
+
+``normalize_companies`` turns whatever the caller has into the
+``{ticker: zero-padded CIK}`` dict the fetch code expects:
+
+    normalize_companies(["LMT", "NOC", "BRK.B"])
+    normalize_companies({"GD": "", "GE": "0000040545"})   # blank CIKs resolved
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Mapping
+
+from responseCache import CACHE_DIR, atomic_write
+from secHttp import fetch_with_retry
+
+COMPANY_TICKERS_URL = "https://www.sec.gov/files/company_tickers.json"
+TICKERS_PATH = CACHE_DIR / "company_tickers.json"
+TICKERS_TTL_HOURS = float(os.getenv("SEC_API_TICKERS_TTL_HOURS", "24"))
+
+
+def normalize_ticker(ticker: str) -> str:
+    """SEC spells share classes with a dash: ``brk.b`` -> ``BRK-B``."""
+    return ticker.strip().upper().replace(".", "-")
+
+
+class TickerIndex:
+    """Lazily loaded ticker -> CIK and CIK -> ticker dicts."""
+
+    def __init__(self, path: Path = TICKERS_PATH, ttl_seconds: float = TICKERS_TTL_HOURS * 3600) -> None:
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._by_ticker: dict[str, str] | None = None
+        self._by_cik: dict[str, str] | None = None
+
+    def _read_payload(self) -> dict | None:
+        fresh = self.path.exists() and time.time() - self.path.stat().st_mtime <= self.ttl_seconds
+        if not fresh:
+            response = fetch_with_retry(COMPANY_TICKERS_URL)
+            if response is not None:
+                try:
+                    atomic_write(self.path, response.content)
+                except OSError as err:
+                    print(f"[WARN] Could not cache {COMPANY_TICKERS_URL}: {err}")
+                return response.json()
+            if self.path.exists():
+                print(f"[WARN] Using stale ticker index {self.path}")
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _load(self) -> None:
+        if self._by_ticker is not None:
+            return
+        with self._lock:
+            if self._by_ticker is not None:
+                return
+            payload = self._read_payload()
+            if payload is None:
+                print("[ERROR] Ticker index unavailable; tickers without a CIK can't be resolved")
+                payload = {}
+
+            by_ticker: dict[str, str] = {}
+            by_cik: dict[str, str] = {}
+            # Entries are listed in SEC order; the first ticker of a CIK is its primary listing
+            for entry in payload.values():
+                ticker = normalize_ticker(str(entry.get("ticker", "")))
+                cik = str(entry.get("cik_str", "")).zfill(10)
+                if not ticker:
+                    continue
+                by_ticker.setdefault(ticker, cik)
+                by_cik.setdefault(cik, ticker)
+            self._by_cik = by_cik
+            self._by_ticker = by_ticker
+
+    @property
+    def ticker_to_cik(self) -> dict[str, str]:
+        self._load()
+        return self._by_ticker  # type: ignore[return-value]
+
+    @property
+    def cik_to_ticker(self) -> dict[str, str]:
+        self._load()
+        return self._by_cik  # type: ignore[return-value]
+
+    def cik_for(self, ticker: str) -> str | None:
+        return self.ticker_to_cik.get(normalize_ticker(ticker))
+
+    def ticker_for(self, cik: str | int) -> str | None:
+        return self.cik_to_ticker.get(str(cik).zfill(10))
+
+
+TICKER_INDEX = TickerIndex()
+
+
+def normalize_companies(companies: Mapping[str, str] | Iterable[str], index: TickerIndex = TICKER_INDEX) -> dict[str, str]:
+    """
+    Return ``{ticker: zero-padded CIK}`` for a ticker list or a ticker -> CIK dict.
+
+    CIKs already given are kept (only zero-padded), so the index is never
+    downloaded for a fully specified dict. Tickers that can't be resolved
+    are reported and left out.
+    """
+    items = companies.items() if isinstance(companies, Mapping) else ((ticker, "") for ticker in companies)
+
+    resolved: dict[str, str] = {}
+    for ticker, cik in items:
+        cik = str(cik or "").strip()
+        if not cik:
+            cik = index.cik_for(ticker) or ""
+            if not cik:
+                print(f"[WARN] No CIK found for {ticker}; skipping")
+                continue
+        resolved[ticker] = cik.zfill(10)
+    return resolved
@@ -0,0 +1,144 @@
+"""
+External watchlists and sharded universe execution.
+
+A watchlist replaces the hardcoded ``COMPANIES`` dict. Supported formats:
+
+* CSV with a ``Ticker`` column and an optional ``CIK`` column (header names
+  are case-insensitive), or a headerless file with one ticker per line.
+* YAML (needs ``pip install pyyaml``): a list of tickers, a ticker -> CIK
+  mapping, or either of those under a ``companies:`` key.
+
+Blank CIKs are resolved with tickerResolver.
+
+``shard_companies`` splits a universe into N disjoint slices by a stable
+hash of the CIK, so N batch nodes can each run ``--shard i/N`` and write
+their own ``*.shard-i-of-N.csv`` outputs; ``merge_shard_outputs`` then
+concatenates them.
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+import zlib
+from pathlib import Path
+from typing import Any, Mapping
+
+import pandas as pd
+
+from longSchema import PRIMARY_KEY_COLUMNS
+from tickerResolver import normalize_companies
+
+try:
+    import yaml  # type: ignore
+except ImportError:  # only needed for .yaml/.yml watchlists
+    yaml = None
+
+WATCHLIST_PATH = os.getenv("SEC_API_WATCHLIST")
+
+
+def _companies_from_yaml(data: Any) -> Mapping[str, str] | list[str]:
+    if isinstance(data, dict) and "companies" in data:
+        data = data["companies"]
+    if isinstance(data, dict):
+        return {str(ticker): str(cik or "") for ticker, cik in data.items()}
+    if isinstance(data, list):
+        return [str(ticker) for ticker in data]
+    raise ValueError("YAML watchlist must be a list of tickers or a ticker -> CIK mapping")
+
+
+def _companies_from_csv(path: Path) -> dict[str, str]:
+    with path.open(newline="", encoding="utf-8-sig") as handle:
+        rows = [row for row in csv.reader(handle) if row and row[0].strip()]
+    if not rows:
+        return {}
+
+    header = [col.strip().lower() for col in rows[0]]
+    if "ticker" not in header:
+        return {row[0].strip(): "" for row in rows}  # one ticker per line
+
+    ticker_col = header.index("ticker")
+    cik_col = header.index("cik") if "cik" in header else None
+    companies = {}
+    for row in rows[1:]:
+        ticker = row[ticker_col].strip() if ticker_col < len(row) else ""
+        if not ticker:
+            continue
+        cik = row[cik_col].strip() if cik_col is not None and cik_col < len(row) else ""
+        companies[ticker] = cik
+    return companies
+
+
+def load_watchlist(path: str | Path) -> dict[str, str]:
+    """Read a CSV/YAML watchlist into ``{ticker: zero-padded CIK}``."""
+    path = Path(path)
+    if path.suffix.lower() in {".yaml", ".yml"}:
+        if yaml is None:
+            raise RuntimeError(f"Reading {path} requires PyYAML (pip install pyyaml)")
+        with path.open(encoding="utf-8") as handle:
+            companies = _companies_from_yaml(yaml.safe_load(handle))
+    else:
+        companies = _companies_from_csv(path)
+
+    resolved = normalize_companies(companies)
+    print(f"Loaded watchlist {path}: {len(resolved)} companies")
+    return resolved
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """Parse ``"i/N"`` (1-based) into ``(i, N)``."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must look like i/N, got {value!r}") from None
+    if not 1 <= index <= count:
+        raise ValueError(f"Shard index must be between 1 and {count}, got {index}")
+    return index, count
+
+
+def shard_of(cik: str, count: int) -> int:
+    """1-based shard for ``cik``; stable across runs, machines and Python versions."""
+    return zlib.crc32(cik.zfill(10).encode("ascii")) % count + 1
+
+
+def shard_companies(companies: Mapping[str, str], index: int, count: int) -> dict[str, str]:
+    """Return the companies belonging to shard ``index`` of ``count``."""
+    return {ticker: cik for ticker, cik in companies.items() if shard_of(cik, count) == index}
+
+
+def shard_path(path: str | Path, index: int, count: int) -> str:
+    """``fundamentals_long.csv`` -> ``fundamentals_long.shard-2-of-8.csv``."""
+    path = Path(path)
+    return str(path.with_name(f"{path.stem}.shard-{index}-of-{count}{path.suffix}"))
+
+
+def merge_shard_outputs(count: int, paths: tuple[str, ...] = ("fundamentals_long.csv", "fundamentals_wide.csv")) -> None:
+    """
+    Concatenate the per-shard CSVs for each of ``paths``.
+
+    Shards hold disjoint companies, so no deduplication is needed; wide
+    files may differ in metric columns and are aligned on the union, in the
+    column and row order ``save_outputs`` writes (index, sorted metrics,
+    Filing Date; rows sorted by Ticker/Fiscal Year/Period).
+    """
+    for path in paths:
+        parts = [shard_path(path, index, count) for index in range(1, count + 1)]
+        missing = [part for part in parts if not Path(part).exists()]
+        if missing:
+            print(f"[WARN] Missing shard outputs for {path}: {', '.join(missing)}")
+        # round_trip keeps every float exactly as the shard wrote it
+        frames = [
+            pd.read_csv(part, dtype={"Ticker": str, "CIK": str}, float_precision="round_trip")
+            for part in parts if Path(part).exists()
+        ]
+        if not frames:
+            continue
+        merged = pd.concat(frames, ignore_index=True, sort=False)
+        if frames[0].columns[-1] == "Filing Date":  # wide layout keeps Filing Date last
+            index = list(PRIMARY_KEY_COLUMNS)
+            metrics = sorted(col for col in merged.columns if col not in index + ["Filing Date"])
+            merged = merged[index + metrics + ["Filing Date"]]
+            # Same row order as the pivot in build_wide
+            merged = merged.sort_values(index, kind="stable").reset_index(drop=True)
+        merged.to_csv(path, index=False)
+        print(f"✓ Merged {len(frames)} shards -> {path} ({len(merged)} rows)")